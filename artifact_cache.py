@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import zipfile
+import numpy as np
+
+logger = logging.getLogger()
+
+# 缓存格式或算法变化时递增，旧条目自然失效并被 LRU 淘汰
+ARTIFACT_VERSION = 1
+
+DEFAULT_CACHE_MAX_BYTES = 10 * 1024 ** 3
+
+
+def input_fingerprint(path):
+    """输入文件指纹：绝对路径 + 大小 + 修改时间"""
+    stat = os.stat(path)
+    return {'path': os.path.realpath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class ArtifactCache:
+    """按内容寻址的中间结果缓存：键为输入指纹、阶段名和该阶段依赖的参数的 SHA-256，值为 npz 文件
+
+    总大小超过上限时按最近使用时间（文件 mtime，读取命中时刷新）淘汰最旧的条目。
+    写入先落到临时文件再原子替换，多个工作进程可以共用同一个缓存目录。
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(fingerprint, stage, **params):
+        payload = json.dumps({'version': ARTIFACT_VERSION, 'input': fingerprint, 'stage': stage, 'params': params},
+                             sort_keys=True)
+        return f"{stage}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def load(self, key):
+        """读取缓存的数组字典，未命中或文件损坏时返回 None"""
+        path = self.path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            os.utime(path)
+            return arrays
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning(f"缓存文件损坏，已删除: {path} ({e})")
+            self.discard(path)
+            return None
+
+    def save(self, key, **arrays):
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 缓存写入失败不影响处理结果
+            logger.warning(f"写入缓存失败: {path} ({e})")
+            self.discard(tmp_path)
+            return
+        self.evict()
+
+    @staticmethod
+    def discard(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self):
+        """总大小超过上限时删除最久未使用的条目"""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= size
@@ -0,0 +1,113 @@
+"""无界面批处理入口，适用于没有显示器的服务器
+
+示例：
+    python batch_cli.py --data D:\\data-combitation --output D:\\debug_ptcloud --roi-radius 0.5 --threshold 0.0003
+    python batch_cli.py --config batch.json
+
+配置文件为 JSON，键名与命令行参数的长名相同（用下划线代替连字符），命令行参数优先。
+本模块不导入 PyQt5，open3d/scipy 等依赖只在真正处理点云时才加载。
+"""
+import time
+
+_START_TIME = time.perf_counter()
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="点云批处理（无界面）")
+    parser.add_argument('--config', help="JSON 配置文件路径")
+    parser.add_argument('--data', dest='data_folder_path', help="数据根文件夹")
+    parser.add_argument('--output', dest='output_folder_path', help="输出根文件夹")
+    parser.add_argument('--roi-radius', type=float, default=0.5)
+    parser.add_argument('--threshold', type=float, default=0.0003)
+    parser.add_argument('--erosion-ratio', type=float, default=0.01)
+    parser.add_argument('--density-threshold', type=float, default=0.1)
+    parser.add_argument('--decoder-path', help="TestRangeImage.exe 路径，也可以是 fake_range_image.py")
+    parser.add_argument('--decoder-concurrency', type=int, default=2)
+    parser.add_argument('--tile-count', type=int, default=1)
+    parser.add_argument('--tile-min-points', type=int, default=2000000)
+    parser.add_argument('--ascii-ply', action='store_true', help="着色点云以 ASCII 格式写出")
+    parser.add_argument('--double-poisson', action='store_true', help="对原始点云和着色点云分别做 Poisson 重建（旧行为）")
+    parser.add_argument('--voxel-size', type=float, help="在体素代表点上计算曲率（体素边长），标签按最近代表点传回原始点；"
+                        "开启后忽略 --tile-count，也不使用曲率缓存")
+    parser.add_argument('--voxel-accuracy-check', action='store_true', help="体素模式下额外计算全分辨率结果并报告精度")
+    parser.add_argument('--cache-dir', help="中间结果缓存目录；只改阈值时复用曲率、法向和 Poisson 网格")
+    parser.add_argument('--cache-size-gb', type=float, default=10, help="缓存目录大小上限（GB），超出时淘汰最久未用的条目")
+    parser.add_argument('--max-workers', type=int, help="工作进程数，默认 CPU 核数减 4（至少 1 个）")
+    parser.add_argument('--memory-budget-gb', type=float, help="同时处理的文件估计内存之和的上限（GB），默认为可用内存的 80%%")
+    parser.add_argument('--bytes-per-point', type=int, default=800, help="按 PLY 头部顶点数估计内存时每个点的字节数")
+    parser.add_argument('--worker-max-tasks', type=int, default=20, help="每个工作进程处理多少个文件后重启（Python 3.11+）")
+    parser.add_argument('--metrics-path', help="各阶段指标 JSONL 路径，默认为输出文件夹下的 ptcloud_metrics.jsonl")
+    parser.add_argument('--image-root', help="图片组文件夹结构的输出位置，默认 debug_folder/data_combitation")
+    parser.add_argument('--skip-processing', action='store_true', help="只创建图片组文件夹，不处理点云")
+    parser.add_argument('--skip-image-folders', action='store_true', help="只处理点云，不创建图片组文件夹")
+    parser.add_argument('--sweep-grid', help="参数扫描网格 JSON（键为 roi_radius/threshold/erosion_ratio/density_threshold，"
+                                             "值为列表），对输出文件夹中已解码的 PLY 做扫描而不生成输出")
+    parser.add_argument('--sweep-output', default='sweep_results.csv', help="参数扫描结果 CSV 路径")
+    parser.add_argument('--dry-run', action='store_true', help="只解析参数并报告启动耗时")
+    return parser
+
+
+def parse_args(argv=None):
+    parser = build_parser()
+    args, _ = parser.parse_known_args(argv)
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            parser.set_defaults(**json.load(f))
+    args = parser.parse_args(argv)
+    if not args.data_folder_path or not args.output_folder_path:
+        parser.error("必须指定 --data 和 --output（或在配置文件中提供 data_folder_path / output_folder_path）")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from pt_cloud_processor import DEFAULT_DECODER_PATH, PLYProcessor, is_decoder_output
+    from image_group_processor import create_image_folders
+
+    processor = PLYProcessor(args.roi_radius, args.threshold, args.erosion_ratio, args.density_threshold,
+                             binary_ply=not args.ascii_ply, single_poisson=not args.double_poisson,
+                             tile_count=args.tile_count, tile_min_points=args.tile_min_points,
+                             decoder_path=args.decoder_path or DEFAULT_DECODER_PATH,
+                             decoder_concurrency=args.decoder_concurrency, metrics_path=args.metrics_path,
+                             voxel_size=args.voxel_size, voxel_accuracy_check=args.voxel_accuracy_check,
+                             cache_dir=args.cache_dir, cache_max_bytes=int(args.cache_size_gb * 1024 ** 3),
+                             max_workers=args.max_workers,
+                             memory_budget=int(args.memory_budget_gb * 1024 ** 3) if args.memory_budget_gb else None,
+                             bytes_per_point=args.bytes_per_point, worker_max_tasks=args.worker_max_tasks)
+    logger.info(f"启动耗时: {time.perf_counter() - _START_TIME:.3f} s（已加载 PyQt5: {'PyQt5' in sys.modules}）")
+    if args.dry_run:
+        return 0
+
+    if args.sweep_grid:
+        with open(args.sweep_grid, 'r', encoding='utf-8') as f:
+            grid = json.load(f)
+        ply_paths = [os.path.join(dirpath, filename)
+                     for dirpath, _, filenames in sorted(os.walk(args.output_folder_path))
+                     for filename in sorted(filenames) if is_decoder_output(filename)]
+        logger.info(f"参数扫描: 共 {len(ply_paths)} 个 PLY 文件")
+        processor.sweep_files(ply_paths, grid, args.sweep_output)
+        return 0
+
+    if not args.skip_processing:
+        processor.process_all_subfolders(args.data_folder_path, args.output_folder_path)
+
+    if not args.skip_image_folders:
+        image_root = args.image_root or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_folder',
+                                                     'data_combitation')
+        create_image_folders(args.data_folder_path, image_root)
+
+    logger.info(f"批处理完成，总耗时 {time.perf_counter() - _START_TIME:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+MANIFEST_NAME = 'ptcloud_manifest.json'
+
+# 完成/失败的更新累积到一定时间才写回一次清单，避免每个文件都重写整个清单
+SAVE_INTERVAL_SECONDS = 5.0
+
+# 处理中的输出先写到带此前缀的临时文件，全部成功后再替换为正式文件名
+STAGING_PREFIX = '.~'
+
+
+def staged_path(path):
+    """输出文件对应的临时文件路径（保留 .ply 扩展名，open3d 依赖扩展名判断格式）"""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, STAGING_PREFIX + name)
+
+
+def commit_staged(paths):
+    """把临时文件原子替换为正式输出"""
+    for path in paths:
+        os.replace(staged_path(path), path)
+
+
+def remove_stale_staged(folder):
+    """清理上次中断遗留的临时文件"""
+    for filename in os.listdir(folder):
+        if filename.startswith(STAGING_PREFIX):
+            os.remove(os.path.join(folder, filename))
+
+
+def file_fingerprint(path):
+    """输入文件指纹：大小 + 修改时间"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def folder_fingerprint(folder):
+    """数据文件夹指纹：所有文件的相对路径、大小和修改时间的摘要"""
+    digest = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, folder)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class BatchManifest:
+    """记录每个输出对应的输入指纹、参数和状态，使批处理可以增量、断点续跑
+
+    更新先保存在内存中，每隔 SAVE_INTERVAL_SECONDS 秒、调用 flush 或退出 with 块时写回磁盘。
+    running 状态不单独触发写回：中断后未写回的条目仍是旧状态，其指纹或状态不匹配时照样会重新处理。
+    """
+
+    def __init__(self, output_folder_path, save_interval=SAVE_INTERVAL_SECONDS):
+        self.path = os.path.join(output_folder_path, MANIFEST_NAME)
+        self.output_folder_path = output_folder_path
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()  # 保证按更新顺序写回，较旧的快照不会覆盖较新的
+        self.dirty = False  # 内存中有未写回的完成/失败记录
+        self.last_save = time.monotonic()
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('entries', {})
+            except (OSError, ValueError):
+                # 清单损坏时全部视为过期，重新处理
+                self.entries = {}
+
+    def key(self, path):
+        return os.path.relpath(path, self.output_folder_path).replace(os.sep, '/')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                data = json.dumps({'version': 1, 'entries': self.entries}, ensure_ascii=False, indent=1)
+                self.dirty = False
+                self.last_save = time.monotonic()
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+
+    def flush(self):
+        """有未写回的更新时立即写回（每个子文件夹提交完成后和批处理结束时调用）"""
+        if self.dirty:
+            self.save()
+
+    def is_up_to_date(self, key, fingerprint, params):
+        """条目已完成、指纹和参数未变且所有输出文件仍存在"""
+        with self.lock:
+            entry = self.entries.get(key)
+        if not entry or entry.get('status') != 'done':
+            return False
+        if entry.get('fingerprint') != fingerprint or entry.get('params') != params:
+            return False
+        return all(os.path.exists(os.path.join(self.output_folder_path, output)) for output in entry['outputs'])
+
+    def _update(self, key, persist=True, **fields):
+        with self.lock:
+            self.entries[key] = dict(fields, updated=time.strftime('%Y-%m-%d %H:%M:%S'))
+            if persist:
+                self.dirty = True
+            due = self.dirty and time.monotonic() - self.last_save >= self.save_interval
+        if due:
+            self.save()
+
+    def mark_running(self, key, fingerprint, params):
+        self._update(key, persist=False, status='running', fingerprint=fingerprint, params=params, outputs=[])
+
+    def mark_done(self, key, fingerprint, params, outputs):
+        self._update(key, status='done', fingerprint=fingerprint, params=params, outputs=[self.key(p) for p in outputs])
+
+    def mark_failed(self, key, fingerprint, params, error):
+        self._update(key, status='failed', fingerprint=fingerprint, params=params, outputs=[], error=str(error))
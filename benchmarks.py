@@ -0,0 +1,468 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from queue import Empty
+import numpy as np
+from curvature_engine import voxel_accuracy_report
+from ply_io import read_ply_vertices, vertex_xyz, write_colored_ply
+from stage_metrics import peak_rss_bytes
+
+# 合成点云类型和默认规模
+CLOUD_KINDS = ('plane', 'sphere', 'noisy_scan')
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+# 按期望邻点数选取 roi_radius，使不同规模的点云邻域大小相近
+TARGET_NEIGHBORS = 30
+
+PIPELINE_STAGES = ('load', 'kdtree', 'neighbor_graph', 'curvature', 'variance_coloring', 'write_binary',
+                   'write_ascii', 'mesh')
+
+# 每个阶段直接依赖的阶段；只选部分阶段时前置阶段照常执行，但不计入结果
+STAGE_DEPENDENCIES = {'load': (), 'kdtree': ('load',), 'neighbor_graph': ('kdtree',),
+                      'curvature': ('neighbor_graph',), 'variance_coloring': ('curvature',),
+                      'write_binary': ('variance_coloring',), 'write_ascii': ('variance_coloring',),
+                      'mesh': ('kdtree',)}
+
+# 等待子进程结果时检查其是否仍在运行的间隔（秒）
+CASE_POLL_SECONDS = 1.0
+
+
+def _legacy_ascii_writer(path, points):
+    """旧版逐行 f-string 写出器，仅用于基准对比"""
+    with open(path, 'w') as f:
+        f.write("ply\nformat ascii 1.0\n")
+        f.write(f"element vertex {len(points)}\n")
+        f.write("property float x\nproperty float y\nproperty float z\n")
+        f.write("property uchar red\nproperty uchar green\nproperty uchar blue\nend_header\n")
+        for i, row in points.iterrows():
+            f.write(f"{row['x']} {row['y']} {row['z']} {int(row['red'])} {int(row['green'])} {int(row['blue'])}\n")
+
+
+def bench_ply_writer(point_count, include_legacy=True, seed=0):
+    """比较二进制写出、批量 ASCII 写出和旧版逐行写出的耗时与文件大小"""
+    rng = np.random.default_rng(seed)
+    xyz = rng.random((point_count, 3), dtype=np.float32)
+    rgb = np.zeros((point_count, 3), dtype=np.uint8)
+    rgb[rng.random(point_count) < 0.1] = [255, 0, 0]
+
+    writers = {
+        'binary': lambda path: write_colored_ply(path, xyz, rgb, binary=True),
+        'ascii_bulk': lambda path: write_colored_ply(path, xyz, rgb, binary=False),
+    }
+    if include_legacy:
+        import pandas as pd
+        points = pd.DataFrame(xyz, columns=['x', 'y', 'z'])
+        points[['red', 'green', 'blue']] = rgb.astype(np.int64)
+        writers['ascii_legacy'] = lambda path: _legacy_ascii_writer(path, points)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, writer in writers.items():
+            path = os.path.join(tmp_dir, f"{name}.ply")
+            start = time.perf_counter()
+            writer(path)
+            elapsed = time.perf_counter() - start
+            results[name] = {'seconds': elapsed, 'bytes': os.path.getsize(path),
+                             'points_per_second': point_count / elapsed if elapsed > 0 else float('inf')}
+    return results
+
+
+def _legacy_load_job(path):
+    """旧版加载路径：PyntCloud + pandas，附加 int64 颜色列和 Python 列表曲率列"""
+    from pyntcloud import PyntCloud
+    from scipy.spatial import KDTree
+    points = PyntCloud.from_file(path).points
+    tree = KDTree(points[['x', 'y', 'z']].values)
+    points['curvature'] = [0.0] * len(points)
+    points['red'] = 0
+    points['green'] = 0
+    points['blue'] = 0
+    xyz = points[['x', 'y', 'z']].values
+    rgb = points[['red', 'green', 'blue']].values.astype(np.uint8)
+    return tree.n, xyz.nbytes + rgb.nbytes
+
+
+def _memmap_load_job(path):
+    """新版加载路径：内存映射结构化数组 + float64 曲率 + uint8 颜色"""
+    from scipy.spatial import KDTree
+    xyz = vertex_xyz(read_ply_vertices(path))
+    tree = KDTree(xyz)
+    curvatures = np.zeros(len(xyz), dtype=np.float64)
+    rgb = np.zeros((len(xyz), 3), dtype=np.uint8)
+    return tree.n, curvatures.nbytes + rgb.nbytes
+
+
+def _measure_job(job, path, queue):
+    baseline = peak_rss_bytes()
+    start = time.perf_counter()
+    job(path)
+    queue.put({'seconds': time.perf_counter() - start, 'baseline_rss': baseline, 'peak_rss': peak_rss_bytes()})
+
+
+def bench_loader(point_count, seed=0):
+    """在独立子进程中分别运行两种加载路径，比较耗时和峰值 RSS"""
+    rng = np.random.default_rng(seed)
+    xyz = rng.random((point_count, 3), dtype=np.float32)
+    rgb = np.zeros((point_count, 3), dtype=np.uint8)
+
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'cloud.ply')
+        write_colored_ply(path, xyz, rgb)
+        for name, job in (('pyntcloud', _legacy_load_job), ('memmap', _memmap_load_job)):
+            queue = context.Queue()
+            process = context.Process(target=_measure_job, args=(job, path, queue))
+            process.start()
+            results[name] = queue.get()
+            process.join()
+    return results
+
+
+def synthetic_cloud(kind, point_count, seed=0):
+    """生成合成点云，返回 (xyz, 表面积)；表面积用于推算 roi_radius"""
+    rng = np.random.default_rng(seed)
+    if kind == 'plane':
+        xy = rng.random((point_count, 2))
+        xyz = np.column_stack([xy, np.zeros(point_count)])
+        area = 1.0
+    elif kind == 'sphere':
+        directions = rng.normal(size=(point_count, 3))
+        xyz = directions / np.linalg.norm(directions, axis=1, keepdims=True)
+        area = 4 * math.pi
+    elif kind == 'noisy_scan':
+        # 与 fake_range_image.py 相同的起伏曲面，另加 2% 的离群点模拟扫描噪声
+        xy = rng.random((point_count, 2)) * 2.0
+        z = 0.05 * np.sin(3 * xy[:, 0]) * np.cos(2 * xy[:, 1]) + rng.normal(0, 0.002, point_count)
+        outliers = rng.random(point_count) < 0.02
+        z[outliers] += rng.normal(0, 0.05, int(outliers.sum()))
+        xyz = np.column_stack([xy, z])
+        area = 4.0
+    else:
+        raise ValueError(f"未知的点云类型: {kind}")
+    return xyz.astype(np.float32), area
+
+
+def _stage_record(name, point_count, fn, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = fn()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    record = {'stage': name, 'points': point_count, 'wall_seconds': wall, 'cpu_seconds': cpu,
+              'points_per_second': point_count / wall if wall > 0 else None, 'peak_rss': peak_rss_bytes()}
+    if trace_memory:
+        record['traced_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, record
+
+
+def required_stages(stages):
+    """所选阶段加上它们的全部前置阶段"""
+    required = set()
+    pending = list(stages)
+    while pending:
+        stage = pending.pop()
+        if stage not in required:
+            required.add(stage)
+            pending.extend(STAGE_DEPENDENCIES[stage])
+    return required
+
+
+def _run_case(kind, point_count, stages, trace_memory, queue):
+    """在独立进程中依次计时各阶段，保证峰值 RSS 只反映当前这一个点云；出错时也送回带错误信息的记录"""
+    records = []
+    current = {'stage': None}  # 正在执行的阶段，出错时写入错误记录
+    try:
+        _time_stages(kind, point_count, stages, trace_memory, records, current)
+    except BaseException as e:
+        records.append({'stage': current['stage'], 'points': point_count, 'cloud': kind,
+                        'error': f"{type(e).__name__}: {e}"})
+    queue.put(records)
+
+
+def _time_stages(kind, point_count, stages, trace_memory, records, current):
+    from scipy.spatial import KDTree
+    from curvature_engine import NeighborGraph
+    from pt_cloud_processor import PLYProcessor
+
+    xyz, area = synthetic_cloud(kind, point_count)
+    roi_radius = math.sqrt(TARGET_NEIGHBORS * area / (math.pi * point_count))
+    processor = PLYProcessor(roi_radius, 1e-5, 0.01, 0.1)
+    required = required_stages(stages)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_path = os.path.join(tmp_dir, 'input.ply')
+        write_colored_ply(input_path, xyz, np.zeros((point_count, 3), dtype=np.uint8))
+
+        def run(stage, fn):
+            if stage not in required:
+                return None
+            current['stage'] = stage
+            if stage not in stages:
+                return fn()
+            result, record = _stage_record(stage, point_count, fn, trace_memory)
+            records.append(dict(record, cloud=kind, roi_radius=roi_radius))
+            return result
+
+        xyz = run('load', lambda: vertex_xyz(read_ply_vertices(input_path)))
+        tree = run('kdtree', lambda: KDTree(xyz))
+        graph = run('neighbor_graph', lambda: NeighborGraph.build(xyz, tree, roi_radius))
+        curvatures = run('curvature', lambda: processor.calculate_curvatures(xyz, graph))
+        red_mask = run('variance_coloring', lambda: processor.curvature_variance_mask(graph, curvatures))
+        rgb = np.zeros((point_count, 3), dtype=np.uint8)
+        rgb[red_mask] = [255, 0, 0]
+        run('write_binary', lambda: write_colored_ply(os.path.join(tmp_dir, 'binary.ply'), xyz, rgb))
+        run('write_ascii', lambda: write_colored_ply(os.path.join(tmp_dir, 'ascii.ply'), xyz, rgb, binary=False))
+        if 'mesh' in stages:
+            try:
+                import open3d as o3d
+            except ImportError as e:
+                records.append({'stage': 'mesh', 'points': point_count, 'cloud': kind, 'skipped': str(e)})
+            else:
+                run('mesh', lambda: processor.reconstruct_mesh(o3d.io.read_point_cloud(input_path), tree))
+
+
+def bench_voxel(point_count, voxel_ratios=(0.25, 0.5, 1.0), kind='noisy_scan', seed=0):
+    """比较不同体素边长（相对 roi_radius）下体素模式与全分辨率的耗时和标签精度"""
+    from scipy.spatial import KDTree
+    from pt_cloud_processor import PLYProcessor
+
+    xyz, area = synthetic_cloud(kind, point_count, seed)
+    roi_radius = math.sqrt(TARGET_NEIGHBORS * area / (math.pi * point_count))
+    tree = KDTree(xyz)
+    start = time.perf_counter()
+    full_curvatures, full_red = PLYProcessor(roi_radius, 1e-5, 0.01, 0.1).curvature_colors(xyz, tree)
+    full_seconds = time.perf_counter() - start
+
+    results = {}
+    for ratio in voxel_ratios:
+        processor = PLYProcessor(roi_radius, 1e-5, 0.01, 0.1, voxel_size=ratio * roi_radius)
+        start = time.perf_counter()
+        curvatures, red_mask = processor.voxel_curvature_colors(xyz, tree)
+        seconds = time.perf_counter() - start
+        report = voxel_accuracy_report(full_curvatures, full_red, curvatures, red_mask)
+        results[ratio] = dict(report, seconds=seconds, full_seconds=full_seconds, speedup=full_seconds / seconds)
+    return results
+
+
+def _legacy_exposure_count(thresholded, exposure_threshold, continuous_pixel_count):
+    """旧版 check_exposure 的逐像素循环（不含日志），作为正确性和速度的基准"""
+    total_overexposure_count = 0
+    for row in thresholded:
+        consecutive_count = 0
+        for pixel in row:
+            if pixel >= exposure_threshold:
+                consecutive_count += 1
+                if consecutive_count >= continuous_pixel_count:
+                    total_overexposure_count += 1
+                    break
+            else:
+                consecutive_count = 0
+    return total_overexposure_count
+
+
+def synthetic_exposure_image(height, width, seed=0):
+    """带若干过曝光斑和噪声的 8 位灰度图"""
+    rng = np.random.default_rng(seed)
+    image = rng.normal(120, 40, (height, width)).clip(0, 255)
+    rows, cols = np.ogrid[:height, :width]
+    for _ in range(8):
+        cy, cx, radius = rng.integers(0, height), rng.integers(0, width), rng.integers(1, max(2, height // 8))
+        image[(rows - cy) ** 2 + (cols - cx) ** 2 < radius ** 2] = 255
+    return image.astype(np.uint8)
+
+
+def bench_exposure(height=2048, width=2448, cases=((235, 5), (200, 20), (0, 3), (255, 1)), include_legacy=True,
+                   seed=0):
+    """比较向量化过曝检测与旧版逐像素循环的耗时，并校验过曝行数完全一致"""
+    from exposure_detector import count_overexposed_rows
+
+    image = synthetic_exposure_image(height, width, seed)
+    results = {}
+    for exposure_threshold, continuous_pixel_count in cases:
+        start = time.perf_counter()
+        count = count_overexposed_rows(image, exposure_threshold, continuous_pixel_count)
+        result = {'rows': count, 'seconds': time.perf_counter() - start}
+        if include_legacy:
+            # 与 cv2.threshold(image, T, 255, THRESH_BINARY) 的输出相同
+            thresholded = np.where(image > exposure_threshold, 255, 0).astype(np.uint8)
+            start = time.perf_counter()
+            legacy_count = _legacy_exposure_count(thresholded, exposure_threshold, continuous_pixel_count)
+            result.update(legacy_rows=legacy_count, legacy_seconds=time.perf_counter() - start)
+            if legacy_count != count:
+                raise AssertionError(f"过曝行数不一致: {legacy_count} != {count} (阈值 {exposure_threshold}, "
+                                     f"连续像素 {continuous_pixel_count})")
+        results[(exposure_threshold, continuous_pixel_count)] = result
+    return results
+
+
+def bench_exposure_index(height=2048, width=2448, seed=0):
+    """过曝索引：一次性建表的耗时，以及调整参数后查表与重新检测的耗时对比，并校验结果一致"""
+    from exposure_detector import count_overexposed_rows
+    from exposure_index import DEFAULT_MIN_LEVEL, MAX_INDEXED_RUN, entry_row_count, exposure_run_counts
+
+    image = synthetic_exposure_image(height, width, seed)
+    start = time.perf_counter()
+    entry = {'height': height, 'width': width, 'min_level': DEFAULT_MIN_LEVEL,
+             'counts': exposure_run_counts(image, DEFAULT_MIN_LEVEL)}
+    build_seconds = time.perf_counter() - start
+    cases = [(threshold, run_length) for threshold in range(DEFAULT_MIN_LEVEL, 256, 11)
+             for run_length in (1, 3, 10, 40, MAX_INDEXED_RUN)]
+    start = time.perf_counter()
+    indexed = [entry_row_count(entry, threshold, run_length) for threshold, run_length in cases]
+    query_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    direct = [count_overexposed_rows(image, threshold, run_length) for threshold, run_length in cases]
+    direct_seconds = time.perf_counter() - start
+    if indexed != direct:
+        raise AssertionError("过曝索引与逐张检测的过曝行数不一致")
+    return {'build_seconds': build_seconds, 'queries': len(cases), 'query_seconds': query_seconds,
+            'direct_seconds': direct_seconds}
+
+
+def bench_bulk_export(file_count=200, file_size=5 * 1024 ** 2, modes=('copy', 'hardlink', 'reflink', 'tar', 'zip')):
+    """批量导出：逐个 shutil.copy2 与各导出方式的耗时，以及目标已是最新时再次导出的耗时"""
+    import shutil
+    from bulk_export import export_files
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_dir = os.path.join(tmp_dir, 'source')
+        os.makedirs(source_dir)
+        plan = []
+        for i in range(file_count):
+            src = os.path.join(source_dir, f'image_{i}.tif')
+            with open(src, 'wb') as f:
+                f.write(os.urandom(file_size))
+            plan.append((src, os.path.join(f'data{i % 10}', 'tiff', f'image_{i}.tif')))
+
+        start = time.perf_counter()
+        for src, relative_path in plan:
+            dest = os.path.join(tmp_dir, 'sequential', relative_path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(src, dest)
+        results['sequential'] = {'seconds': time.perf_counter() - start}
+
+        for mode in modes:
+            destination = os.path.join(tmp_dir, mode)
+            start = time.perf_counter()
+            summary = export_files(plan, destination, mode)
+            result = {'seconds': time.perf_counter() - start, 'copied': summary['copied']}
+            if mode not in ('tar', 'zip'):
+                start = time.perf_counter()
+                result['skipped'] = export_files(plan, destination, mode)['skipped']
+                result['rerun_seconds'] = time.perf_counter() - start
+            results[mode] = result
+    return results
+
+
+def _wait_case(process, queue, kind, point_count):
+    """等待子进程送回记录；子进程没有送回结果就退出（如内存不足被杀死）时返回一条失败记录"""
+    while True:
+        try:
+            return queue.get(timeout=CASE_POLL_SECONDS)
+        except Empty:
+            if process.is_alive():
+                continue
+        # 子进程已退出，结果可能刚写入管道，再等一次
+        try:
+            return queue.get(timeout=CASE_POLL_SECONDS)
+        except Empty:
+            return [{'stage': None, 'points': point_count, 'cloud': kind,
+                     'error': f"子进程异常退出 (exitcode {process.exitcode})"}]
+
+
+def run_benchmark_suite(output_path, kinds=CLOUD_KINDS, sizes=DEFAULT_SIZES, stages=PIPELINE_STAGES,
+                        trace_memory=False):
+    """对每种合成点云和规模分别计时各阶段，结果逐行追加到 JSONL 文件"""
+    metadata = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                'numpy': np.__version__, 'machine': platform.machine(), 'cpu_count': os.cpu_count(),
+                'trace_memory': trace_memory}
+    context = multiprocessing.get_context('spawn')
+    all_records = []
+    with open(output_path, 'a', encoding='utf-8') as f:
+        for kind in kinds:
+            for size in sizes:
+                queue = context.Queue()
+                process = context.Process(target=_run_case, args=(kind, size, tuple(stages), trace_memory, queue))
+                process.start()
+                records = _wait_case(process, queue, kind, size)
+                process.join()
+                for record in records:
+                    record.update(metadata)
+                    f.write(json.dumps(record) + '\n')
+                    all_records.append(record)
+                f.flush()
+    return all_records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="点云处理基准测试")
+    parser.add_argument('benchmark', choices=['suite', 'writer', 'loader', 'voxel', 'exposure', 'exposure-index',
+                                              'bulk-export'],
+                        nargs='?', default='suite')
+    parser.add_argument('--points', type=int, default=200000)
+    parser.add_argument('--skip-legacy', action='store_true', help="跳过旧版逐行写出器（点数很大时很慢）")
+    parser.add_argument('--kinds', nargs='+', choices=CLOUD_KINDS, default=list(CLOUD_KINDS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES), help="点数，可到 10000000")
+    parser.add_argument('--stages', nargs='+', choices=PIPELINE_STAGES, default=list(PIPELINE_STAGES))
+    parser.add_argument('--trace-memory', action='store_true', help="用 tracemalloc 统计每个阶段的分配峰值（会拖慢计时）")
+    parser.add_argument('--output', default='bench_results.jsonl', help="结果 JSONL 文件（追加写入）")
+    parser.add_argument('--image-size', nargs=2, type=int, default=[2048, 2448], metavar=('HEIGHT', 'WIDTH'),
+                        help="过曝检测基准的图像尺寸")
+    parser.add_argument('--files', type=int, default=200, help="批量导出基准的文件数")
+    parser.add_argument('--file-size', type=int, default=5 * 1024 ** 2, help="批量导出基准的单个文件字节数")
+    parser.add_argument('--voxel-ratios', nargs='+', type=float, default=[0.25, 0.5, 1.0],
+                        help="体素边长与 roi_radius 的比值")
+    args = parser.parse_args()
+
+    if args.benchmark == 'suite':
+        for record in run_benchmark_suite(args.output, args.kinds, args.sizes, args.stages, args.trace_memory):
+            if 'skipped' in record:
+                print(f"{record['cloud']:>10} {record['points']:>9} {record['stage']:>18}: 跳过 ({record['skipped']})")
+            elif 'error' in record:
+                print(f"{record['cloud']:>10} {record['points']:>9} {record['stage'] or '-':>18}: 失败 ({record['error']})")
+            else:
+                print(f"{record['cloud']:>10} {record['points']:>9} {record['stage']:>18}: "
+                      f"{record['wall_seconds']:8.3f} s, {record['points_per_second'] or 0:12.0f} points/s, "
+                      f"peak RSS {(record['peak_rss'] or 0) / 1e6:8.1f} MB")
+    elif args.benchmark == 'writer':
+        for name, result in bench_ply_writer(args.points, include_legacy=not args.skip_legacy).items():
+            print(f"{name:>12}: {result['seconds']:.3f} s, {result['bytes'] / 1e6:.1f} MB, "
+                  f"{result['points_per_second']:.0f} points/s")
+    elif args.benchmark == 'exposure':
+        for (threshold, run_length), result in bench_exposure(*args.image_size,
+                                                              include_legacy=not args.skip_legacy).items():
+            line = f"threshold {threshold:>3}, run {run_length:>3}: {result['rows']:>5} rows, {result['seconds']:.4f} s"
+            if 'legacy_seconds' in result:
+                line += f" vs legacy {result['legacy_seconds']:.2f} s ({result['legacy_seconds'] / result['seconds']:.0f}x)"
+            print(line)
+    elif args.benchmark == 'exposure-index':
+        result = bench_exposure_index(*args.image_size)
+        print(f"build {result['build_seconds']:.3f} s, {result['queries']} queries {result['query_seconds'] * 1e3:.2f} ms "
+              f"vs re-detect {result['direct_seconds']:.2f} s")
+    elif args.benchmark == 'bulk-export':
+        for name, result in bench_bulk_export(args.files, args.file_size).items():
+            line = f"{name:>10}: {result['seconds']:.3f} s"
+            if result.get('copied'):
+                line += f" ({result['copied']} files fell back to copy)"
+            if 'rerun_seconds' in result:
+                line += f", re-run {result['rerun_seconds']:.3f} s ({result['skipped']} skipped)"
+            print(line)
+    elif args.benchmark == 'voxel':
+        for ratio, result in bench_voxel(args.points, args.voxel_ratios).items():
+            print(f"voxel {ratio:>5.2f} x roi: {result['seconds']:.3f} s vs {result['full_seconds']:.3f} s "
+                  f"({result['speedup']:.1f}x), agreement {result['label_agreement']:.4f}, "
+                  f"red precision {result['red_precision']:.4f}, recall {result['red_recall']:.4f}, "
+                  f"curvature MAE {result['curvature_mae']:.3g}")
+    else:
+        for name, result in bench_loader(args.points).items():
+            growth = (result['peak_rss'] - result['baseline_rss']) / 1e6 if result['peak_rss'] else float('nan')
+            print(f"{name:>12}: {result['seconds']:.3f} s, peak RSS {result['peak_rss'] / 1e6:.1f} MB "
+                  f"(+{growth:.1f} MB during the job)")
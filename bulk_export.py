@@ -0,0 +1,145 @@
+"""批量导出：把选出的组的图片复制、硬链接、reflink 到目标文件夹，或流式写入一个 tar/zip 归档
+
+目标文件夹模式下多个文件并行处理，目标处已有大小和修改时间都相同的文件时跳过；
+归档模式按顺序写入临时文件，全部完成后才改名为正式归档，取消或出错时不留下半个归档。
+"""
+import errno
+import logging
+import os
+import shutil
+import tarfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger()
+
+EXPORT_MODES = ('copy', 'hardlink', 'reflink', 'tar', 'zip')
+ARCHIVE_MODES = ('tar', 'zip')
+
+# Linux 上的写时复制克隆 ioctl（btrfs、XFS 等支持）
+FICLONE = 0x40049409
+
+
+def archive_path(destination, mode):
+    """归档模式的输出文件：目标文件夹名加扩展名"""
+    return f"{destination}.{mode}"
+
+
+def files_identical(src, dest):
+    """目标文件已是同一文件（硬链接），或大小和修改时间都相同"""
+    try:
+        src_stat = os.stat(src)
+        dest_stat = os.stat(dest)
+    except FileNotFoundError:
+        return False
+    if os.path.samestat(src_stat, dest_stat):
+        return True
+    # copy2 会保留修改时间，部分文件系统的时间精度较低，允许 1 秒以内的差异
+    return src_stat.st_size == dest_stat.st_size and abs(src_stat.st_mtime_ns - dest_stat.st_mtime_ns) < 1000000000
+
+
+def reflink_file(src, dest):
+    """写时复制克隆，文件系统或系统不支持时抛出 OSError"""
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.EOPNOTSUPP, "当前系统不支持 reflink")
+    with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+        fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+    shutil.copystat(src, dest)
+
+
+def export_file(src, dest, mode):
+    """把一个文件导出到 dest，返回 'skipped'、'exported' 或 'copied'（硬链接/reflink 不可用而改为复制）"""
+    if files_identical(src, dest):
+        return 'skipped'
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if mode == 'copy':
+        shutil.copy2(src, dest)
+        return 'exported'
+    try:
+        if mode == 'hardlink':
+            if os.path.lexists(dest):
+                os.remove(dest)
+            os.link(src, dest)
+        else:
+            reflink_file(src, dest)
+        return 'exported'
+    except OSError:
+        # 跨文件系统、文件系统不支持等情况退回普通复制
+        shutil.copy2(src, dest)
+        return 'copied'
+
+
+def export_files(plan, destination, mode='copy', max_workers=None, cancel_event=None, progress_callback=None):
+    """按 plan [(源文件, 目标相对路径), ...] 导出
+
+    progress_callback(已完成数, 总数) 在调用线程中调用；cancel_event 被设置后不再开始新的文件。
+    返回 {'exported', 'skipped', 'copied', 'failed', 'cancelled'}。
+    """
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"未知的导出方式: {mode}")
+    summary = {'exported': 0, 'skipped': 0, 'copied': 0, 'failed': 0, 'cancelled': False}
+    if mode in ARCHIVE_MODES:
+        export_archive(plan, archive_path(destination, mode), mode, summary, cancel_event, progress_callback)
+    else:
+        export_to_folder(plan, destination, mode, summary, max_workers, cancel_event, progress_callback)
+    summary['cancelled'] = cancel_event is not None and cancel_event.is_set()
+    return summary
+
+
+def export_to_folder(plan, destination, mode, summary, max_workers, cancel_event, progress_callback):
+    total = len(plan)
+    done_count = 0
+    max_workers = max_workers or min(16, (os.cpu_count() or 1) + 4)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = {executor.submit(export_file, src, os.path.join(destination, relative_path), mode): src
+                   for src, relative_path in plan}
+        while pending and not (cancel_event is not None and cancel_event.is_set()):
+            # 定时醒来检查取消标志
+            done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                src = pending.pop(future)
+                done_count += 1
+                try:
+                    summary[future.result()] += 1
+                except Exception as e:
+                    summary['failed'] += 1
+                    logger.error(f"导出文件失败: {src} ({e})")
+            if done and progress_callback is not None:
+                progress_callback(done_count, total)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def export_archive(plan, output_path, mode, summary, cancel_event, progress_callback):
+    total = len(plan)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    completed = False
+    try:
+        # 图片本身已是压缩或难以压缩的数据，归档只打包不压缩，写入速度受限于磁盘
+        if mode == 'tar':
+            archive = tarfile.open(tmp_path, 'w')
+            add = archive.add
+        else:
+            archive = zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+            add = archive.write
+        with archive:
+            for done_count, (src, relative_path) in enumerate(plan, start=1):
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                try:
+                    add(src, relative_path.replace(os.sep, '/'))
+                    summary['exported'] += 1
+                except OSError as e:
+                    summary['failed'] += 1
+                    logger.error(f"导出文件失败: {src} ({e})")
+                if progress_callback is not None:
+                    progress_callback(done_count, total)
+        os.replace(tmp_path, output_path)
+        completed = True
+    finally:
+        if not completed and os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,197 @@
+import itertools
+import numpy as np
+
+# 每批查询的点数，控制邻域展开后的内存峰值
+DEFAULT_CHUNK_SIZE = 65536
+
+
+def _lists_to_csr(neighbor_lists, index_dtype=np.int64):
+    """把 query_ball_point 返回的邻域列表转换为 CSR 形式 (indptr, indices)"""
+    counts = np.fromiter((len(n) for n in neighbor_lists), dtype=np.int64, count=len(neighbor_lists))
+    indptr = np.zeros(len(neighbor_lists) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.fromiter(itertools.chain.from_iterable(neighbor_lists), dtype=index_dtype, count=int(indptr[-1]))
+    return indptr, indices
+
+
+class NeighborGraph:
+    """ROI 半径内的邻域图，以 CSR 形式存储，供曲率和方差着色两个阶段共用"""
+
+    def __init__(self, indptr, indices, radius, point_count, query_ids=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.radius = radius
+        self.point_count = point_count
+        self.query_ids = query_ids  # 每行对应的查询点索引，None 表示所有点依次作为查询点
+
+    @classmethod
+    def build(cls, xyz, tree, radius, query_ids=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """分批执行半径查询并拼接为一张 CSR 图，邻点按索引升序排列"""
+        index_dtype = np.int32 if len(xyz) < np.iinfo(np.int32).max else np.int64
+        query_count = len(xyz) if query_ids is None else len(query_ids)
+        indptr_parts = [np.zeros(1, dtype=np.int64)]
+        indices_parts = []
+        offset = 0
+        for start in range(0, query_count, chunk_size):
+            stop = min(start + chunk_size, query_count)
+            queries = xyz[start:stop] if query_ids is None else xyz[query_ids[start:stop]]
+            neighbor_lists = tree.query_ball_point(queries, radius, workers=-1, return_sorted=True)
+            indptr, indices = _lists_to_csr(neighbor_lists, index_dtype)
+            indptr_parts.append(indptr[1:] + offset)
+            indices_parts.append(indices)
+            offset += len(indices)
+        indices = np.concatenate(indices_parts) if indices_parts else np.zeros(0, dtype=index_dtype)
+        return cls(np.concatenate(indptr_parts), indices, radius, len(xyz), query_ids)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    @property
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def chunk(self, start, stop):
+        """返回 [start, stop) 行的局部 CSR（indptr 从 0 开始）"""
+        lo, hi = self.indptr[start], self.indptr[stop]
+        return self.indptr[start:stop + 1] - lo, self.indices[lo:hi]
+
+    def centers(self, start, stop):
+        """[start, stop) 行对应的查询点索引"""
+        return np.arange(start, stop) if self.query_ids is None else self.query_ids[start:stop]
+
+    def chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            yield (start, stop) + self.chunk(start, stop)
+
+    def restrict(self, xyz, radius, chunk_size=DEFAULT_CHUNK_SIZE):
+        """从当前图中筛出距离不超过 radius 的边，得到更小半径的邻域图，无需重新查询 KD 树"""
+        if radius >= self.radius:
+            return self
+        keep_counts = np.zeros(len(self), dtype=np.int64)
+        indices_parts = []
+        for start, stop, indptr, indices in self.chunks(chunk_size):
+            rows = np.repeat(np.arange(stop - start), np.diff(indptr))
+            # 与 KD 树查询一致，在 float64 下比较平方距离
+            offsets = xyz[indices].astype(np.float64) - xyz[self.centers(start, stop)[rows]].astype(np.float64)
+            keep = np.add.reduce(offsets * offsets, axis=1) <= radius * radius
+            keep_counts[start:stop] = np.bincount(rows[keep], minlength=stop - start)
+            indices_parts.append(indices[keep])
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(keep_counts, out=indptr[1:])
+        indices = np.concatenate(indices_parts) if indices_parts else self.indices[:0]
+        return NeighborGraph(indptr, indices, radius, self.point_count, self.query_ids)
+
+
+def _chunk_curvatures(xyz, centers, indptr, indices, roi_radius, erosion_ratio):
+    """计算一批点的曲率，邻域以 CSR 形式给出，第 i 行的查询点为 xyz[centers[i]]"""
+    m = len(indptr) - 1
+    curvatures = np.zeros(m, dtype=np.float64)
+    if m == 0:
+        return curvatures
+
+    counts = np.diff(indptr)
+    rows = np.repeat(np.arange(m), counts)
+    center_rows = centers[rows]
+
+    # 与逐点实现一致：在原始精度下计算距离并做侵蚀收缩
+    offsets = xyz[indices] - xyz[center_rows]
+    distances = np.sqrt(np.add.reduce(offsets * offsets, axis=1))
+    valid_idx = distances <= (1 - erosion_ratio) * roi_radius
+    rows = rows[valid_idx]
+    # 协方差在 float64 下计算，避免 float32 坐标相减带来的舍入误差
+    offsets = xyz[indices[valid_idx]].astype(np.float64) - xyz[center_rows[valid_idx]].astype(np.float64)
+
+    n = np.bincount(rows, minlength=m)
+    enough = n >= 3
+    if not np.any(enough):
+        return curvatures
+
+    # 以查询点为原点累加一阶、二阶矩，再组装为 (N,3,3) 协方差矩阵
+    sums = np.empty((m, 3), dtype=np.float64)
+    for a in range(3):
+        sums[:, a] = np.bincount(rows, weights=offsets[:, a], minlength=m)
+    second = np.empty((m, 3, 3), dtype=np.float64)
+    for a in range(3):
+        for b in range(a, 3):
+            second[:, a, b] = np.bincount(rows, weights=offsets[:, a] * offsets[:, b], minlength=m)
+            second[:, b, a] = second[:, a, b]
+
+    n = n[enough].astype(np.float64)
+    sums = sums[enough]
+    covariance = (second[enough] - sums[:, :, None] * sums[:, None, :] / n[:, None, None]) / (n - 1)[:, None, None]
+
+    eigvals = np.linalg.eigvalsh(covariance)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curvatures[enough] = eigvals[:, 0] / np.sum(eigvals, axis=1)
+    return curvatures
+
+
+def batched_curvatures(xyz, graph, roi_radius, erosion_ratio, chunk_size=DEFAULT_CHUNK_SIZE):
+    """批量计算曲率 λ0/Σλ，结果与逐点实现一致（侵蚀收缩、少于 3 个邻点记为 0）"""
+    curvatures = np.zeros(len(graph), dtype=np.float64)
+    for start, stop, indptr, indices in graph.chunks(chunk_size):
+        curvatures[start:stop] = _chunk_curvatures(xyz, graph.centers(start, stop), indptr, indices, roi_radius,
+                                                   erosion_ratio)
+    return curvatures
+
+
+def curvature_variance(graph, curvatures, chunk_size=DEFAULT_CHUNK_SIZE):
+    """每个点邻域内曲率的方差（两遍法，与 np.var 一致），邻点少于 2 个时为 NaN"""
+    variances = np.full(len(graph), np.nan, dtype=np.float64)
+    for start, stop, indptr, indices in graph.chunks(chunk_size):
+        m = stop - start
+        counts = np.diff(indptr)
+        rows = np.repeat(np.arange(m), counts)
+        values = curvatures[indices]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.bincount(rows, weights=values, minlength=m) / counts
+            deviations = values - means[rows]
+            chunk_variances = np.bincount(rows, weights=deviations * deviations, minlength=m) / counts
+        enough = counts >= 2
+        variances[start:stop][enough] = chunk_variances[enough]
+    return variances
+
+
+def paint_flagged_neighborhoods(graph, flagged, chunk_size=DEFAULT_CHUNK_SIZE):
+    """把所有被标记行的整个邻域标记出来，返回长度为点数的布尔掩码"""
+    mask = np.zeros(graph.point_count, dtype=bool)
+    for start, stop, indptr, indices in graph.chunks(chunk_size):
+        rows = np.repeat(np.arange(stop - start), np.diff(indptr))
+        mask[indices[flagged[start:stop][rows]]] = True
+    return mask
+
+
+def voxel_representatives(xyz, voxel_size):
+    """按体素网格下采样，每个非空体素取其中点的质心作为代表点"""
+    keys = np.floor(np.asarray(xyz, dtype=np.float64) / voxel_size).astype(np.int64)
+    keys -= keys.min(axis=0)
+    dims = keys.max(axis=0) + 1
+    if float(dims[0]) * float(dims[1]) * float(dims[2]) < np.iinfo(np.int64).max:
+        # 三维体素坐标压成一个整数，避免对 (N,3) 数组做按行 unique
+        linear = (keys[:, 0] * dims[1] + keys[:, 1]) * dims[2] + keys[:, 2]
+        _, inverse, counts = np.unique(linear, return_inverse=True, return_counts=True)
+    else:
+        _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    representatives = np.empty((len(counts), 3), dtype=np.float64)
+    for axis in range(3):
+        representatives[:, axis] = np.bincount(inverse, weights=xyz[:, axis], minlength=len(counts)) / counts
+    return representatives
+
+
+def voxel_accuracy_report(full_curvatures, full_red, voxel_curvatures, voxel_red):
+    """比较体素模式与全分辨率的结果：标签一致率、红色点的精确率/召回率、曲率误差"""
+    true_positive = int(np.count_nonzero(full_red & voxel_red))
+    voxel_red_count = int(np.count_nonzero(voxel_red))
+    full_red_count = int(np.count_nonzero(full_red))
+    curvature_error = np.abs(np.nan_to_num(full_curvatures) - np.nan_to_num(voxel_curvatures))
+    return {
+        'points': len(full_red),
+        'label_agreement': float(np.mean(full_red == voxel_red)) if len(full_red) else 1.0,
+        'red_precision': true_positive / voxel_red_count if voxel_red_count else 1.0,
+        'red_recall': true_positive / full_red_count if full_red_count else 1.0,
+        'full_red_count': full_red_count,
+        'voxel_red_count': voxel_red_count,
+        'curvature_mae': float(np.mean(curvature_error)) if len(curvature_error) else 0.0,
+    }
@@ -0,0 +1,181 @@
+"""数据集索引：子文件夹 -> 组 -> 组内 TIFF 文件，以及每个子文件夹输出目录中已有的文件，连同每个文件的大小和修改时间
+
+启动时用线程池并行扫描一次，之后由文件系统监视器报告的目录变化逐个目录增量更新，
+界面中的查询（组内图片、缺少 PLY 的组、输出文件列表、导出、缩略图和几何体的缓存键）都只查内存，不再访问磁盘。
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from exposure_detector import exposure_group_name
+
+logger = logging.getLogger()
+
+
+def expected_outputs(group_name):
+    """处理完成后输出文件夹中该组应有的文件：解码得到的点云、着色点云和两种网格"""
+    return (f"{group_name}.ply", f"{group_name}_colored.ply", f"{group_name}_original_filtered_mesh.ply",
+            f"{group_name}_colored_colored_filtered_mesh.ply")
+
+
+def list_files(folder, suffix=''):
+    """目录中以 suffix 结尾的文件 {文件名: (大小, 修改时间)}（按文件名排序），目录不存在时返回 None"""
+    try:
+        with os.scandir(folder) as entries:
+            files = {}
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return dict(sorted(files.items()))
+
+
+def list_subfolders(folder):
+    try:
+        with os.scandir(folder) as entries:
+            return sorted(entry.name for entry in entries if entry.is_dir())
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+class DatasetIndex:
+    """输入/输出目录的内存索引，只在界面线程中使用"""
+
+    def __init__(self, input_folder, output_folder):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.tiff_files = {}  # 子文件夹 -> 排序后的 TIFF 文件名（没有 tiff 文件夹的子文件夹不在其中）
+        self.groups = {}  # 子文件夹 -> {组名: 组内排序后的 TIFF 文件名}
+        self.output_files = {}  # 子文件夹 -> 输出文件夹中排序后的文件名（输出文件夹不存在时为 None）
+        self.output_sets = {}  # 子文件夹 -> 输出文件名集合，用于 O(1) 判断文件是否存在
+        self.group_folders = {}  # 组名 -> 包含该组的子文件夹列表
+        self.file_stats = {}  # tiff 文件夹或输出子文件夹（规范化路径） -> {文件名: (大小, 修改时间)}
+
+    def tiff_folder(self, subfolder):
+        return os.path.join(self.input_folder, subfolder, 'tiff')
+
+    def output_subfolder(self, subfolder):
+        return os.path.join(self.output_folder, subfolder)
+
+    def build(self, max_workers=None):
+        """并行扫描所有子文件夹的 tiff 文件夹和输出文件夹"""
+        subfolders = list_subfolders(self.input_folder)
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            tiff_listings = list(executor.map(lambda subfolder: list_files(self.tiff_folder(subfolder), '.tif'),
+                                              subfolders))
+            output_listings = list(executor.map(lambda subfolder: list_files(self.output_subfolder(subfolder)),
+                                                subfolders))
+        self.tiff_files, self.groups, self.output_files, self.output_sets, self.group_folders = {}, {}, {}, {}, {}
+        self.file_stats = {}
+        for subfolder, tiff_files, output_files in zip(subfolders, tiff_listings, output_listings):
+            self.set_tiff_files(subfolder, tiff_files)
+            if tiff_files is not None:
+                self.set_output_files(subfolder, output_files)
+        logger.info(f"数据集索引已建立: {len(self.tiff_files)} 个数据文件夹, "
+                    f"{sum(len(groups) for groups in self.groups.values())} 个组")
+
+    def set_tiff_files(self, subfolder, tiff_files):
+        for group_name in self.groups.pop(subfolder, {}):
+            folders = self.group_folders.get(group_name, [])
+            if subfolder in folders:
+                folders.remove(subfolder)
+            if not folders:
+                self.group_folders.pop(group_name, None)
+        if tiff_files is None:
+            self.tiff_files.pop(subfolder, None)
+            self.file_stats.pop(os.path.normpath(self.tiff_folder(subfolder)), None)
+            return
+        self.file_stats[os.path.normpath(self.tiff_folder(subfolder))] = tiff_files
+        tiff_files = list(tiff_files)
+        self.tiff_files[subfolder] = tiff_files
+        groups = {}
+        for tiff_file in tiff_files:
+            groups.setdefault(exposure_group_name(tiff_file), []).append(tiff_file)
+        self.groups[subfolder] = groups
+        for group_name in groups:
+            self.group_folders.setdefault(group_name, []).append(subfolder)
+
+    def set_output_files(self, subfolder, output_files):
+        self.file_stats[os.path.normpath(self.output_subfolder(subfolder))] = output_files or {}
+        self.output_files[subfolder] = None if output_files is None else list(output_files)
+        self.output_sets[subfolder] = set(output_files or ())
+
+    def refresh_folder(self, path):
+        """文件系统监视器报告目录变化时只重新扫描该目录，返回受影响的子文件夹（无法对应时返回 None）"""
+        path = os.path.normpath(path)
+        if path in (os.path.normpath(self.input_folder), os.path.normpath(self.output_folder)):
+            self.refresh_subfolders()
+            return None
+        parent, name = os.path.split(path)
+        if name == 'tiff' and os.path.normpath(os.path.dirname(parent)) == os.path.normpath(self.input_folder):
+            subfolder = os.path.basename(parent)
+            self.set_tiff_files(subfolder, list_files(path, '.tif'))
+            if subfolder in self.tiff_files and subfolder not in self.output_files:
+                self.set_output_files(subfolder, list_files(self.output_subfolder(subfolder)))
+            return subfolder
+        if os.path.normpath(parent) == os.path.normpath(self.output_folder):
+            if name in self.tiff_files:
+                self.set_output_files(name, list_files(path))
+            return name
+        return None
+
+    def refresh_subfolders(self):
+        """数据或输出根目录变化：加入新增的子文件夹，移除已删除的，并重新扫描输出文件夹的有无"""
+        subfolders = set(list_subfolders(self.input_folder))
+        for subfolder in list(self.tiff_files):
+            if subfolder not in subfolders:
+                self.set_tiff_files(subfolder, None)
+                self.output_files.pop(subfolder, None)
+                self.output_sets.pop(subfolder, None)
+                self.file_stats.pop(os.path.normpath(self.output_subfolder(subfolder)), None)
+        for subfolder in sorted(subfolders):
+            if subfolder not in self.tiff_files:
+                self.set_tiff_files(subfolder, list_files(self.tiff_folder(subfolder), '.tif'))
+            if subfolder in self.tiff_files:
+                output_subfolder = self.output_subfolder(subfolder)
+                if (self.output_files.get(subfolder) is None) == os.path.isdir(output_subfolder):
+                    self.set_output_files(subfolder, list_files(output_subfolder))
+
+    def watched_folders(self):
+        """需要监视的目录：数据和输出根目录、各 tiff 文件夹和已存在的输出子文件夹"""
+        folders = [self.input_folder, self.output_folder]
+        for subfolder in self.tiff_files:
+            folders.append(self.tiff_folder(subfolder))
+            if self.output_files.get(subfolder) is not None:
+                folders.append(self.output_subfolder(subfolder))
+        return folders
+
+    def file_stat(self, path):
+        """索引中记录的 (大小, 修改时间)，不在索引中时返回 None"""
+        folder, name = os.path.split(os.path.normpath(path))
+        return self.file_stats.get(folder, {}).get(name)
+
+    def group_tiff_files(self, subfolder, group_name):
+        return self.groups.get(subfolder, {}).get(group_name, [])
+
+    def has_output(self, subfolder, filename):
+        return filename in self.output_sets.get(subfolder, ())
+
+    def group_outputs(self, subfolder, group_name):
+        """{应有的输出文件名: 是否已存在}"""
+        return {filename: self.has_output(subfolder, filename) for filename in expected_outputs(group_name)}
+
+    def missing_ply_groups(self, subfolder):
+        """子文件夹中还没有解码 PLY 的组"""
+        return {group_name for group_name in self.groups.get(subfolder, {})
+                if not self.has_output(subfolder, expected_outputs(group_name)[0])}
+
+    def group_tiff_paths(self, group_names):
+        """[(子文件夹, 组内 TIFF 完整路径列表), ...]，按组名直接查找，不再遍历所有文件"""
+        result = []
+        for group_name in group_names:
+            for subfolder in self.group_folders.get(group_name, []):
+                tiff_folder = self.tiff_folder(subfolder)
+                result.append((subfolder, [os.path.join(tiff_folder, tiff_file)
+                                           for tiff_file in self.groups[subfolder][group_name]]))
+        return result
@@ -0,0 +1,109 @@
+"""过曝检测（不依赖 Qt），供界面和批量扫描共用
+
+一行中存在不少于 continuous_pixel_count 个连续过曝像素即记为一个过曝行，
+每组第 3~6 张图的过曝行数之和达到 max_exposure_count 时该组判定为过曝。
+"""
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger()
+
+# 只检查每组中索引为 3~6 的图片（如 image_54_3.tif 中的 3）
+EXPOSURE_IMAGE_INDICES = range(3, 7)
+
+
+def exposure_image_index(tiff_file):
+    """文件名末尾的组内索引，无法解析时返回 None"""
+    index_str = os.path.splitext(tiff_file)[0].split('_')[-1]
+    return int(index_str) if index_str.isdigit() else None
+
+
+def exposure_group_name(tiff_file):
+    """组名，如 image_54_3.tif -> image_54"""
+    return os.path.splitext(tiff_file)[0][:-2]
+
+
+def saturated_mask(image, exposure_threshold):
+    """过曝像素掩码
+
+    与原实现一致：cv2.threshold(THRESH_BINARY) 把大于阈值的像素置 255、其余置 0，再判断是否不小于阈值，
+    因此阈值大于 0 时等价于 image > 阈值，阈值不大于 0 时所有像素都算过曝。
+    """
+    if exposure_threshold <= 0:
+        return np.ones(image.shape, dtype=bool)
+    return image > exposure_threshold
+
+
+def rows_with_saturated_run(mask, run_length):
+    """每行是否存在长度不小于 run_length 的连续 True：用前缀和一次求出所有长度为 run_length 的窗口和"""
+    height, width = mask.shape
+    if run_length <= 1:
+        return mask.any(axis=1)
+    if run_length > width:
+        return np.zeros(height, dtype=bool)
+    # 过曝像素总数不足 run_length 的行不可能有足够长的段，只对其余行求前缀和
+    candidates = np.flatnonzero(np.count_nonzero(mask, axis=1) >= run_length)
+    result = np.zeros(height, dtype=bool)
+    if len(candidates) == 0:
+        return result
+    prefix = np.zeros((len(candidates), width + 1), dtype=np.int32)
+    np.cumsum(mask[candidates], axis=1, dtype=np.int32, out=prefix[:, 1:])
+    result[candidates] = ((prefix[:, run_length:] - prefix[:, :-run_length]) == run_length).any(axis=1)
+    return result
+
+
+def count_overexposed_rows(image, exposure_threshold, continuous_pixel_count):
+    """统计存在足够长过曝像素段的行数"""
+    return int(np.count_nonzero(rows_with_saturated_run(saturated_mask(image, exposure_threshold),
+                                                        continuous_pixel_count)))
+
+
+def read_grayscale(image_path):
+    """以灰度读取图像，读取失败时返回 None"""
+    import cv2
+    return cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+
+
+def group_exposure_counts(tiff_folder_path, tiff_files, exposure_threshold, continuous_pixel_count):
+    """逐张检测组内索引为 3~6 的图片，返回 {组名: 过曝行数之和}"""
+    group_exposure_count = {}
+    for tiff_file in tiff_files:
+        if exposure_image_index(tiff_file) not in EXPOSURE_IMAGE_INDICES:
+            continue
+        image = read_grayscale(os.path.join(tiff_folder_path, tiff_file))
+        if image is None:
+            logger.error(f"无法读取图像: {tiff_file}")
+            continue
+        count = count_overexposed_rows(image, exposure_threshold, continuous_pixel_count)
+        group_name = exposure_group_name(tiff_file)
+        group_exposure_count[group_name] = group_exposure_count.get(group_name, 0) + count
+        logger.info(f"文件 {tiff_file} 检测到过曝，组数: {count}")
+    return group_exposure_count
+
+
+def overexposed_groups(group_exposure_count, max_exposure_count):
+    """过曝行数之和达到上限的组名列表"""
+    return [group_name for group_name, total_count in group_exposure_count.items()
+            if total_count >= max_exposure_count]
+
+
+def exposure_scan_tasks(input_folder):
+    """列出所有数据文件夹中待检测的组：[(tiff 文件夹, 组名, [组内索引 3~6 的文件]), ...]"""
+    tasks = []
+    for subfolder in sorted(os.listdir(input_folder)):
+        tiff_folder_path = os.path.join(input_folder, subfolder, 'tiff')
+        if not os.path.isdir(tiff_folder_path):
+            continue
+        groups = {}
+        for tiff_file in sorted(os.listdir(tiff_folder_path)):
+            if tiff_file.endswith('.tif') and exposure_image_index(tiff_file) in EXPOSURE_IMAGE_INDICES:
+                groups.setdefault(exposure_group_name(tiff_file), []).append(tiff_file)
+        tasks.extend((tiff_folder_path, group_name, tiff_files) for group_name, tiff_files in groups.items())
+    return tasks
+
+
+def scan_exposure_group(tiff_folder_path, group_name, tiff_files, exposure_threshold, continuous_pixel_count):
+    """检测一个组，返回 (组名, 过曝行数之和)；在工作进程中运行"""
+    counts = group_exposure_counts(tiff_folder_path, tiff_files, exposure_threshold, continuous_pixel_count)
+    return group_name, counts.get(group_name, 0)
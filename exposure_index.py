@@ -0,0 +1,232 @@
+"""过曝统计索引：每张图只解码一次，之后调整曝光阈值和连续像素数只查内存中的计数表
+
+对每个 k（1~MAX_INDEXED_RUN）求出每行所有长度为 k 的窗口最小值中的最大值 M_k，
+"阈值 T 下存在不少于 k 个连续过曝像素的行"正好是 M_k > T 的行，
+于是每张图保存一张 [阈值, 连续像素数] -> 过曝行数 的计数表即可回答任意参数。
+索引按 tiff 文件夹保存为 npz，图片的大小或修改时间变化后对应条目自动重算。
+无法解码的图片记为"不可读"条目，文件未变化时不再重复读取。
+"""
+import hashlib
+import logging
+import os
+import threading
+import zipfile
+import numpy as np
+from exposure_detector import (EXPOSURE_IMAGE_INDICES, exposure_group_name, exposure_image_index,
+                               group_exposure_counts as detector_group_exposure_counts, read_grayscale)
+
+logger = logging.getLogger()
+
+# 索引格式或算法变化时递增，旧索引文件整体失效
+INDEX_VERSION = 2
+
+# 计数表覆盖的最大连续像素数，更大的要求回退到逐张检测
+MAX_INDEXED_RUN = 100
+
+# 计数表覆盖的最低阈值（默认 240 以下留有余量），更低的阈值会按需把条目重算到该阈值
+DEFAULT_MIN_LEVEL = 200
+
+
+def exposure_run_counts(image, min_level, max_run=MAX_INDEXED_RUN):
+    """计数表 counts[T - min_level, k]：阈值 T（> 0）下存在不少于 k 个连续像素大于 T 的行数，k = 0 与 k = 1 相同"""
+    width = image.shape[1]
+    # 最大值不超过 min_level 的行在所有阈值下都不过曝
+    rows = image[image.max(axis=1) > min_level]
+    best = np.zeros((len(rows), max_run), dtype=np.uint8)
+    window_min = rows
+    for run_length in range(1, min(max_run, width) + 1):
+        if run_length > 1:
+            # 长度为 k 的窗口最小值由长度为 k-1 的窗口最小值再并入一列得到
+            window_min = np.minimum(window_min[:, :-1], rows[:, run_length - 1:])
+        best[:, run_length - 1] = window_min.max(axis=1)
+    hist = np.stack([np.bincount(best[:, k], minlength=256) for k in range(max_run)])
+    # greater[k, L]：M_(k+1) > L 的行数
+    greater = hist[:, ::-1].cumsum(axis=1)[:, ::-1] - hist
+    counts = np.empty((256 - min_level, max_run + 1), dtype=np.int32)
+    counts[:, 1:] = greater[:, min_level:].T
+    counts[:, 0] = counts[:, 1]
+    return counts
+
+
+def required_level(exposure_threshold):
+    """回答该阈值所需的计数表最低阈值；阈值不大于 0 或不小于 255 时只需要图像尺寸"""
+    if 0 < exposure_threshold < 255:
+        return int(exposure_threshold)
+    return 255
+
+
+def compute_exposure_entries(tiff_folder_path, tiff_files, min_level):
+    """读取图片并计算索引条目 {文件名: 条目}；无法解码的图片返回不可读条目，文件不存在时不返回；可在工作进程中运行"""
+    entries = {}
+    for tiff_file in tiff_files:
+        image_path = os.path.join(tiff_folder_path, tiff_file)
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            logger.error(f"无法读取图像: {tiff_file}")
+            continue
+        image = read_grayscale(image_path)
+        if image is None:
+            logger.error(f"无法读取图像: {tiff_file}")
+            entries[tiff_file] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'unreadable': True}
+            continue
+        entries[tiff_file] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                              'height': image.shape[0], 'width': image.shape[1], 'min_level': min_level,
+                              'counts': exposure_run_counts(image, min_level)}
+    return entries
+
+
+def entry_row_count(entry, exposure_threshold, continuous_pixel_count):
+    """从条目中查出过曝行数，与 exposure_detector.count_overexposed_rows 的结果一致；不可读条目为 0"""
+    if entry.get('unreadable'):
+        return 0
+    if exposure_threshold <= 0:
+        return entry['height'] if continuous_pixel_count <= entry['width'] else 0
+    if exposure_threshold >= 255:
+        return 0
+    return int(entry['counts'][exposure_threshold - entry['min_level'], max(continuous_pixel_count, 0)])
+
+
+class ExposureIndex:
+    """过曝统计索引：内存中按 tiff 文件夹保存条目，文件夹对应的 npz 在首次使用时加载、save 时写回
+
+    界面线程和后台扫描线程可以共用同一个实例。
+    """
+
+    def __init__(self, index_dir, min_level=DEFAULT_MIN_LEVEL):
+        self.index_dir = index_dir
+        self.min_level = min_level
+        self.folders = {}  # tiff 文件夹 -> {文件名: 条目}
+        self.dirty = set()  # 有未保存修改的 tiff 文件夹
+        self.lock = threading.RLock()
+
+    def index_path(self, tiff_folder_path):
+        digest = hashlib.sha1(os.path.realpath(tiff_folder_path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.index_dir, digest + '.npz')
+
+    def _entries(self, tiff_folder_path):
+        entries = self.folders.get(tiff_folder_path)
+        if entries is None:
+            entries = self._load(tiff_folder_path)
+            self.folders[tiff_folder_path] = entries
+        return entries
+
+    def _load(self, tiff_folder_path):
+        path = self.index_path(tiff_folder_path)
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != INDEX_VERSION or str(data['folder']) != os.path.realpath(tiff_folder_path):
+                    return {}
+                entries = {}
+                for i, (name, (size, mtime_ns, height, width, min_level, unreadable)) in enumerate(
+                        zip(data['names'], data['meta'])):
+                    if unreadable:
+                        entries[str(name)] = {'size': int(size), 'mtime_ns': int(mtime_ns), 'unreadable': True}
+                    else:
+                        entries[str(name)] = {'size': int(size), 'mtime_ns': int(mtime_ns), 'height': int(height),
+                                              'width': int(width), 'min_level': int(min_level),
+                                              'counts': data[f'counts_{i}']}
+                return entries
+        except FileNotFoundError:
+            return {}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning(f"过曝索引文件损坏，将重新计算: {path} ({e})")
+            return {}
+
+    def save(self, tiff_folder_path):
+        """把该文件夹的条目写回磁盘（没有修改时不写）"""
+        with self.lock:
+            if tiff_folder_path not in self.dirty:
+                return
+            self.dirty.discard(tiff_folder_path)
+            entries = dict(self.folders[tiff_folder_path])
+        names = sorted(entries)
+        # 不可读条目的尺寸和最低阈值记为 0，没有计数表
+        meta = np.array([[entries[name].get(field, 0) for field in ('size', 'mtime_ns', 'height', 'width', 'min_level')]
+                         + [int(entries[name].get('unreadable', False))] for name in names],
+                        dtype=np.int64).reshape(len(names), 6)
+        counts = {f'counts_{i}': entries[name]['counts'] for i, name in enumerate(names)
+                  if not entries[name].get('unreadable')}
+        path = self.index_path(tiff_folder_path)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(f, version=INDEX_VERSION, folder=os.path.realpath(tiff_folder_path),
+                                    names=np.array(names, dtype=str), meta=meta, **counts)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # 索引写入失败不影响检测结果，下次重新计算
+            logger.warning(f"写入过曝索引失败: {path} ({e})")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def stale_files(self, tiff_folder_path, tiff_files, exposure_threshold):
+        """索引中缺失、图片已修改或计数表不覆盖该阈值的文件（未修改的不可读图片不算）"""
+        level = required_level(exposure_threshold)
+        stale = []
+        with self.lock:
+            entries = self._entries(tiff_folder_path)
+            for tiff_file in tiff_files:
+                entry = entries.get(tiff_file)
+                if entry is None or (not entry.get('unreadable') and entry['min_level'] > level):
+                    stale.append(tiff_file)
+                    continue
+                try:
+                    stat = os.stat(os.path.join(tiff_folder_path, tiff_file))
+                except OSError:
+                    stale.append(tiff_file)
+                    continue
+                if stat.st_size != entry['size'] or stat.st_mtime_ns != entry['mtime_ns']:
+                    stale.append(tiff_file)
+        return stale
+
+    def compute_level(self, exposure_threshold):
+        """新计算的条目覆盖的最低阈值"""
+        return min(self.min_level, required_level(exposure_threshold))
+
+    def update(self, tiff_folder_path, tiff_files, entries):
+        """合并 tiff_files 重新计算得到的条目，其中已不存在的文件从索引中删除"""
+        with self.lock:
+            folder_entries = self._entries(tiff_folder_path)
+            for tiff_file in tiff_files:
+                if tiff_file in entries:
+                    folder_entries[tiff_file] = entries[tiff_file]
+                else:
+                    folder_entries.pop(tiff_file, None)
+            self.dirty.add(tiff_folder_path)
+
+    def group_exposure_counts(self, tiff_folder_path, tiff_files, exposure_threshold, continuous_pixel_count):
+        """与 exposure_detector.group_exposure_counts 相同的结果，只读取索引中缺失或过期的图片"""
+        if continuous_pixel_count > MAX_INDEXED_RUN:
+            return detector_group_exposure_counts(tiff_folder_path, tiff_files, exposure_threshold,
+                                                  continuous_pixel_count)
+        tiff_files = [tiff_file for tiff_file in tiff_files
+                      if exposure_image_index(tiff_file) in EXPOSURE_IMAGE_INDICES]
+        stale = self.stale_files(tiff_folder_path, tiff_files, exposure_threshold)
+        if stale:
+            self.update(tiff_folder_path, stale,
+                        compute_exposure_entries(tiff_folder_path, stale, self.compute_level(exposure_threshold)))
+        return self.indexed_group_counts(tiff_folder_path, tiff_files, exposure_threshold, continuous_pixel_count)
+
+    def indexed_group_counts(self, tiff_folder_path, tiff_files, exposure_threshold, continuous_pixel_count):
+        """只查内存中的条目得出 {组名: 过曝行数之和}，不读取任何图片；索引中没有的图片和不可读图片不计入
+
+        调用前应已用 update 合并 stale_files 的计算结果，且 continuous_pixel_count 不超过 MAX_INDEXED_RUN。
+        """
+        group_exposure_count = {}
+        with self.lock:
+            entries = self._entries(tiff_folder_path)
+            for tiff_file in tiff_files:
+                if exposure_image_index(tiff_file) not in EXPOSURE_IMAGE_INDICES:
+                    continue
+                entry = entries.get(tiff_file)
+                if entry is None or entry.get('unreadable'):
+                    continue
+                count = entry_row_count(entry, exposure_threshold, continuous_pixel_count)
+                group_name = exposure_group_name(tiff_file)
+                group_exposure_count[group_name] = group_exposure_count.get(group_name, 0) + count
+                logger.info(f"文件 {tiff_file} 检测到过曝，组数: {count}")
+        return group_exposure_count
@@ -0,0 +1,51 @@
+"""TestRangeImage.exe 的本地替身，用于在 Linux 上测试批处理流程
+
+用法与真实解码器相同：python fake_range_image.py <数据文件夹> <输出文件夹>
+每 8 张 tiff 为一组，为每组生成一个带噪声起伏曲面的二进制 PLY（<组名>.ply）。
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+import numpy as np
+from ply_io import write_colored_ply
+
+
+def synthetic_scan(seed, point_count):
+    """生成一块带起伏和噪声的扫描曲面"""
+    rng = np.random.default_rng(seed)
+    xy = rng.random((point_count, 2)) * 2.0
+    z = 0.05 * np.sin(3 * xy[:, 0]) * np.cos(2 * xy[:, 1]) + rng.normal(0, 0.002, point_count)
+    return np.column_stack([xy, z]).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TestRangeImage.exe 替身解码器")
+    parser.add_argument('data_folder')
+    parser.add_argument('output_folder')
+    parser.add_argument('--points', type=int, default=int(os.environ.get('FAKE_RANGE_IMAGE_POINTS', 20000)),
+                        help="每组生成的点数")
+    parser.add_argument('--delay', type=float, default=float(os.environ.get('FAKE_RANGE_IMAGE_DELAY', 0)),
+                        help="每组额外等待的秒数，用于模拟解码耗时")
+    args = parser.parse_args()
+
+    tiff_folder = os.path.join(args.data_folder, 'tiff')
+    if not os.path.isdir(tiff_folder):
+        print(f"tiff 文件夹不存在: {tiff_folder}", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_folder, exist_ok=True)
+    tiff_files = sorted(f for f in os.listdir(tiff_folder) if f.endswith('.tif'))
+    for i in range(0, len(tiff_files), 8):
+        group_name = os.path.splitext(tiff_files[i])[0][:-2]
+        time.sleep(args.delay)
+        xyz = synthetic_scan(zlib.crc32(group_name.encode('utf-8')), args.points)
+        rgb = np.full((len(xyz), 3), 128, dtype=np.uint8)
+        write_colored_ply(os.path.join(args.output_folder, f"{group_name}.ply"), xyz, rgb)
+        print(f"[       OK ] {group_name}.ply ({len(xyz)} points)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
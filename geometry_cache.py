@@ -0,0 +1,237 @@
+"""PLY 几何体的后台读取与缓存
+
+open3d 读取点云/网格在线程池中完成，读好的几何体放在按估计字节数限制的 LRU 中，
+切换显示模式或回到看过的组时直接从缓存显示，不再重新读文件。
+细节层次（LOD）模式下同样在线程池中生成不超过点数/三角形数预算的简化版本，与完整几何体分别缓存。
+"""
+import logging
+import math
+import os
+from collections import OrderedDict
+import open3d as o3d
+from PyQt5 import QtCore
+
+logger = logging.getLogger()
+
+DEFAULT_GEOMETRY_CACHE_BYTES = 2 * 1024 ** 3
+
+# 当前显示的文件优先于另一种显示模式的预取
+GEOMETRY_PRIORITY_VISIBLE = 1
+GEOMETRY_PRIORITY_PREFETCH = 0
+
+# 细节层次模式下每个显示窗口的默认预算
+DEFAULT_LOD_POINT_BUDGET = 500000
+DEFAULT_LOD_TRIANGLE_BUDGET = 500000
+
+# 体素边长的最多调整次数
+LOD_MAX_ITERATIONS = 6
+
+
+def geometry_key(ply_path, file_stat=None):
+    """缓存键：绝对路径、文件大小和修改时间，文件被重新生成后自然失效
+
+    给出 file_stat（数据集索引中的 (大小, 修改时间)）时不访问磁盘。
+    """
+    if file_stat is None:
+        stat = os.stat(ply_path)
+        file_stat = (stat.st_size, stat.st_mtime_ns)
+    return (os.path.abspath(ply_path),) + tuple(file_stat)
+
+
+def is_mesh_file(ply_path):
+    """输出文件名中带 mesh 的是 Poisson 网格，其余是点云"""
+    return "mesh" in os.path.basename(ply_path)
+
+
+def read_geometry(ply_path):
+    if is_mesh_file(ply_path):
+        return o3d.io.read_triangle_mesh(ply_path)
+    return o3d.io.read_point_cloud(ply_path)
+
+
+def geometry_nbytes(geometry):
+    """几何体占用内存的估计：坐标、法向、颜色按 float64，三角形按 int32"""
+    if isinstance(geometry, o3d.geometry.TriangleMesh):
+        vertex_arrays = 1 + geometry.has_vertex_normals() + geometry.has_vertex_colors()
+        return len(geometry.vertices) * 24 * vertex_arrays + len(geometry.triangles) * 12
+    return len(geometry.points) * 24 * (1 + geometry.has_normals() + geometry.has_colors())
+
+
+def geometry_size(geometry):
+    """细节层次预算计量的元素数：网格按三角形数，点云按点数"""
+    if isinstance(geometry, o3d.geometry.TriangleMesh):
+        return len(geometry.triangles)
+    return len(geometry.points)
+
+
+def lod_geometry(geometry, budget):
+    """不超过预算的简化几何体：点云做体素降采样，网格做顶点聚类；本身不超过预算时原样返回"""
+    count = geometry_size(geometry)
+    if count <= budget:
+        return geometry
+    mesh = isinstance(geometry, o3d.geometry.TriangleMesh)
+    # 扫描点云和重建的网格都近似为曲面，元素数与体素边长的平方成反比，用包围盒最大的两个边长估计面积
+    extent = sorted(geometry.get_axis_aligned_bounding_box().get_extent())
+    voxel_size = math.sqrt(extent[1] * extent[2] / budget) if extent[1] > 0 else extent[2] / budget
+    lod = geometry
+    for _ in range(LOD_MAX_ITERATIONS):
+        if voxel_size <= 0:
+            break
+        lod = geometry.simplify_vertex_clustering(voxel_size) if mesh else geometry.voxel_down_sample(voxel_size)
+        count = geometry_size(lod)
+        if count <= budget:
+            return lod
+        voxel_size *= math.sqrt(count / budget) * 1.1
+    if mesh:
+        return lod
+    # 点云仍超出预算时再等间隔抽取
+    return lod.uniform_down_sample(math.ceil(count / budget))
+
+
+class GeometrySignals(QtCore.QObject):
+    # QRunnable 不是 QObject，读取结果通过界面线程中创建的信号对象以排队连接送回
+    loaded = QtCore.pyqtSignal(object, str, object)  # 缓存键, PLY 路径, 几何体
+    lod_loaded = QtCore.pyqtSignal(object, str, object)  # 简化版本的缓存键, PLY 路径, 简化几何体
+
+
+class GeometryTask(QtCore.QRunnable):
+    """读取 PLY 文件（已给出 geometry 时跳过），给出 lod_key 时再生成不超过 lod_budget 的简化版本"""
+
+    def __init__(self, key, ply_path, signals, geometry=None, lod_key=None, lod_budget=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.key = key
+        self.ply_path = ply_path
+        self.signals = signals
+        self.geometry = geometry
+        self.lod_key = lod_key
+        self.lod_budget = lod_budget
+
+    def run(self):
+        geometry = self.geometry
+        if geometry is None:
+            try:
+                geometry = read_geometry(self.ply_path)
+            except Exception as e:
+                logger.error(f"读取 PLY 文件出错: {self.ply_path} ({e})")
+                geometry = o3d.geometry.TriangleMesh() if is_mesh_file(self.ply_path) else o3d.geometry.PointCloud()
+            # 先送回完整几何体，简化版本到达时完整几何体已在缓存中
+            self.signals.loaded.emit(self.key, self.ply_path, geometry)
+        if self.lod_key is not None:
+            try:
+                lod = lod_geometry(geometry, self.lod_budget)
+            except Exception as e:
+                logger.warning(f"生成简化几何体出错，直接使用完整几何体: {self.ply_path} ({e})")
+                lod = geometry
+            self.signals.lod_loaded.emit(self.lod_key, self.ply_path, lod)
+
+
+class GeometryLoader(QtCore.QObject):
+    """几何体加载器：request 命中缓存时直接返回几何体，否则排队读取，完成后发出 geometry_ready"""
+    geometry_ready = QtCore.pyqtSignal(str, object)  # PLY 路径, 几何体（读取失败时为空几何体）
+    lod_ready = QtCore.pyqtSignal(str, object)  # PLY 路径, 简化几何体（不超过预算时就是完整几何体）
+
+    def __init__(self, max_bytes=DEFAULT_GEOMETRY_CACHE_BYTES, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        # 缓存键（简化版本的键在末尾加上预算）-> (几何体, 估计字节数)，按最近使用排序
+        self.cache = OrderedDict()
+        self.cache_bytes = 0
+        # 缓存键 -> GeometryTask；任务未设置自动删除，运行结束前必须保留引用
+        self.in_flight = {}
+        # 正在读取的文件 -> {简化版本的键: 预算}，读取完成后再生成简化版本
+        self.lod_after_load = {}
+        self.pool = QtCore.QThreadPool(self)
+        self.signals = GeometrySignals()
+        self.signals.loaded.connect(self.on_loaded)
+        self.signals.lod_loaded.connect(self.on_lod_loaded)
+
+    def request(self, ply_path, priority=GEOMETRY_PRIORITY_VISIBLE, file_stat=None):
+        """返回已缓存的几何体；未缓存时排队读取并返回 None"""
+        try:
+            key = geometry_key(ply_path, file_stat)
+        except OSError:
+            logger.error(f"无法读取 PLY 文件: {ply_path}")
+            return None
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            return cached[0]
+        if key not in self.in_flight:
+            task = GeometryTask(key, ply_path, self.signals)
+            self.in_flight[key] = task
+            self.pool.start(task, priority)
+        return None
+
+    def request_lod(self, ply_path, budget, file_stat=None):
+        """返回已缓存的不超过 budget 的简化版本；未缓存时在后台生成（需要时先读取文件）并返回 None"""
+        try:
+            key = geometry_key(ply_path, file_stat)
+        except OSError:
+            logger.error(f"无法读取 PLY 文件: {ply_path}")
+            return None
+        lod_key = key + (budget,)
+        cached = self.cache.get(lod_key)
+        if cached is not None:
+            self.cache.move_to_end(lod_key)
+            return cached[0]
+        if lod_key in self.in_flight or lod_key in self.lod_after_load.get(key, {}):
+            return None
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            task = GeometryTask(key, ply_path, self.signals, geometry=cached[0], lod_key=lod_key, lod_budget=budget)
+            self.in_flight[lod_key] = task
+            self.pool.start(task, GEOMETRY_PRIORITY_VISIBLE)
+        elif key in self.in_flight:
+            self.lod_after_load.setdefault(key, {})[lod_key] = budget
+        else:
+            task = GeometryTask(key, ply_path, self.signals, lod_key=lod_key, lod_budget=budget)
+            self.in_flight[key] = task
+            self.in_flight[lod_key] = task
+            self.pool.start(task, GEOMETRY_PRIORITY_VISIBLE)
+        return None
+
+    def cancel_pending(self):
+        """丢弃尚未开始的读取任务（切换到其他组时调用），正在运行的任务完成后仍会进入缓存"""
+        taken = set()
+        for key, task in list(self.in_flight.items()):
+            # tryTake 只移除还在队列中的任务；同一任务可能同时登记在完整和简化版本的键下
+            if id(task) in taken or self.pool.tryTake(task):
+                taken.add(id(task))
+                del self.in_flight[key]
+                self.lod_after_load.pop(key, None)
+
+    def on_loaded(self, key, ply_path, geometry):
+        self.in_flight.pop(key, None)
+        if not geometry.is_empty():
+            self.store(key, geometry)
+        self.geometry_ready.emit(ply_path, geometry)
+        for lod_key, budget in self.lod_after_load.pop(key, {}).items():
+            task = GeometryTask(key, ply_path, self.signals, geometry=geometry, lod_key=lod_key, lod_budget=budget)
+            self.in_flight[lod_key] = task
+            self.pool.start(task, GEOMETRY_PRIORITY_VISIBLE)
+
+    def on_lod_loaded(self, lod_key, ply_path, lod):
+        self.in_flight.pop(lod_key, None)
+        if not lod.is_empty():
+            full = self.cache.get(lod_key[:-1])
+            # 不超过预算时简化版本就是完整几何体本身，不重复计入内存
+            self.store(lod_key, lod, 0 if full is not None and full[0] is lod else None)
+        self.lod_ready.emit(ply_path, lod)
+
+    def store(self, key, geometry, nbytes=None):
+        if key in self.cache:
+            self.cache_bytes -= self.cache.pop(key)[1]
+        if nbytes is None:
+            nbytes = geometry_nbytes(geometry)
+        self.cache[key] = (geometry, nbytes)
+        self.cache_bytes += nbytes
+        while self.cache_bytes > self.max_bytes and len(self.cache) > 1:
+            _, (_, evicted_bytes) = self.cache.popitem(last=False)
+            self.cache_bytes -= evicted_bytes
+
+    def shutdown(self):
+        """关闭窗口时调用，等待正在运行的任务结束"""
+        self.cancel_pending()
+        self.pool.waitForDone()
@@ -0,0 +1,123 @@
+import bisect
+import itertools
+import logging
+import threading
+from concurrent.futures import Future
+from ply_io import ply_vertex_count
+
+logger = logging.getLogger()
+
+# 每个点的内存估计：KD 树（float64 坐标副本 + 索引）约 40 B，ROI 邻域图按 30~100 个邻点约 120~400 B，
+# 曲率/方差/颜色约 20 B，open3d 点云、法向和颜色约 72 B，再加上 Poisson 重建的中间数据。
+# 可以用 ptcloud_metrics.jsonl 中的 peak_rss 除以点数重新标定。
+DEFAULT_BYTES_PER_POINT = 800
+
+# 工作进程本身（解释器、numpy/scipy/open3d）的常驻内存
+WORKER_BASE_BYTES = 300 * 1024 ** 2
+
+# 未指定内存预算时使用可用内存的比例
+DEFAULT_BUDGET_FRACTION = 0.8
+
+
+def estimate_ply_memory(ply_path, bytes_per_point=DEFAULT_BYTES_PER_POINT):
+    """只读取 PLY 头部，按顶点数估计处理该文件的峰值内存（字节）"""
+    return WORKER_BASE_BYTES + ply_vertex_count(ply_path) * bytes_per_point
+
+
+def default_memory_budget():
+    """可用内存的 80%；没有 psutil 时不限制"""
+    try:
+        import psutil
+    except ImportError:
+        logger.warning("未安装 psutil，无法获取可用内存，不限制内存预算")
+        return float('inf')
+    return int(psutil.virtual_memory().available * DEFAULT_BUDGET_FRACTION)
+
+
+class MemoryBudgetScheduler:
+    """按内存预算准入任务：已准入任务的估计内存之和不超过预算，同时运行的任务数不超过 max_running
+
+    等待中的任务优先准入剩余预算内放得下的最大者，缩短批次末尾只剩一个大文件在跑的时间，
+    最大的任务暂时放不下时较小的任务照常准入，不让预算和工作进程空闲；
+    超过预算的单个任务在没有其他任务运行时单独准入，避免永远等待。
+    """
+
+    def __init__(self, budget_bytes, max_running):
+        self.budget_bytes = budget_bytes
+        self.max_running = max_running
+        self.condition = threading.Condition()
+        # (估计内存, -登记序号, future, pool, fn, args)，按估计内存升序，相同时先登记的在后；
+        # 前两项总能分出先后，比较不会落到 future 上
+        self.pending = []
+        self.counter = itertools.count()
+        self.used_bytes = 0
+        self.running = 0
+        self.closed = False
+        # 准入在独立线程中进行，不在进程池的回调线程里提交新任务
+        self.thread = threading.Thread(target=self._dispatch, name='memory-scheduler', daemon=True)
+        self.thread.start()
+
+    def submit(self, cost, pool, fn, *args):
+        """登记一个估计内存为 cost 的任务，准入后提交到 pool，返回对应的 Future"""
+        future = Future()
+        with self.condition:
+            bisect.insort(self.pending, (cost, -next(self.counter), future, pool, fn, args))
+            self.condition.notify()
+        return future
+
+    def _admissible_index(self):
+        """可以准入的任务在 pending 中的位置，没有可准入的任务时返回 None"""
+        if not self.pending:
+            return None
+        if self.running == 0:
+            # 没有任务在运行时准入最大的任务，超过预算也单独运行
+            return len(self.pending) - 1
+        if self.running >= self.max_running:
+            return None
+        # 剩余预算内放得下的最大任务
+        index = bisect.bisect_right(self.pending, (self.budget_bytes - self.used_bytes, float('inf')))
+        return index - 1 if index > 0 else None
+
+    def _dispatch(self):
+        while True:
+            with self.condition:
+                index = self._admissible_index()
+                while index is None:
+                    if self.closed and not self.pending:
+                        return
+                    self.condition.wait()
+                    index = self._admissible_index()
+                cost, _, future, pool, fn, args = self.pending.pop(index)
+                self.used_bytes += cost
+                self.running += 1
+            try:
+                inner = pool.submit(fn, *args)
+            except Exception as e:
+                self._release(cost)
+                future.set_exception(e)
+                continue
+            inner.add_done_callback(lambda done, future=future, cost=cost: self._finish(future, cost, done))
+
+    def _release(self, cost):
+        with self.condition:
+            self.used_bytes -= cost
+            self.running -= 1
+            self.condition.notify()
+
+    def _finish(self, future, cost, done):
+        self._release(cost)
+        if done.cancelled():
+            future.cancel()
+            return
+        exception = done.exception()
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(done.result())
+
+    def shutdown(self):
+        """不再接受新任务，等待所有已登记的任务都提交出去"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
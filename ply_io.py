@@ -0,0 +1,143 @@
+import numpy as np
+
+# 着色点云的顶点布局：x/y/z 为 float32，red/green/blue 为 uint8
+COLORED_VERTEX_DTYPE = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                                 ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+
+# ASCII 模式下每次批量格式化的行数
+ASCII_CHUNK_ROWS = 100000
+
+# PLY 标量类型到 NumPy 类型的映射
+PLY_SCALAR_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+
+
+def read_ply_header(path):
+    """解析 PLY 文件头，返回格式、各元素 (名称, 数量, 属性列表) 以及文件头字节数"""
+    elements = []
+    ply_format = None
+    with open(path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f"不是 PLY 文件: {path}")
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"PLY 文件头不完整: {path}")
+            tokens = line.decode('ascii', errors='replace').split()
+            if not tokens or tokens[0] in ('comment', 'obj_info'):
+                continue
+            if tokens[0] == 'format':
+                ply_format = tokens[1]
+            elif tokens[0] == 'element':
+                elements.append((tokens[1], int(tokens[2]), []))
+            elif tokens[0] == 'property' and elements:
+                elements[-1][2].append(tuple(tokens[1:]))
+            elif tokens[0] == 'end_header':
+                return {'format': ply_format, 'elements': elements, 'header_size': f.tell()}
+
+
+def ply_vertex_count(path):
+    """从文件头读取顶点数，不读取点数据"""
+    for name, count, _ in read_ply_header(path)['elements']:
+        if name == 'vertex':
+            return count
+    return 0
+
+
+def _element_dtype(properties, byte_order):
+    """由属性列表构造结构化 dtype；含 list 属性的元素无法按定长记录映射"""
+    fields = []
+    for prop in properties:
+        if prop[0] == 'list':
+            return None
+        fields.append((prop[1], byte_order + PLY_SCALAR_TYPES[prop[0]]))
+    return np.dtype(fields)
+
+
+def read_ply_vertices(path):
+    """读取顶点数据为结构化数组；二进制文件通过 np.memmap 直接映射，不复制点数据"""
+    header = read_ply_header(path)
+    ply_format = header['format']
+    byte_order = {'binary_little_endian': '<', 'binary_big_endian': '>', 'ascii': '<'}.get(ply_format)
+    if byte_order is None:
+        raise ValueError(f"不支持的 PLY 格式 {ply_format}: {path}")
+
+    offset = header['header_size']
+    skipped_rows = 0
+    for name, count, properties in header['elements']:
+        dtype = _element_dtype(properties, byte_order)
+        if name == 'vertex':
+            if dtype is None:
+                raise ValueError(f"vertex 元素包含 list 属性: {path}")
+            if ply_format == 'ascii':
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    return np.loadtxt(f, dtype=dtype, skiprows=skipped_rows, max_rows=count, ndmin=1)
+            return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+        if ply_format == 'ascii':
+            skipped_rows += count
+        elif dtype is None:
+            raise ValueError(f"vertex 之前的元素 {name} 包含 list 属性，无法定位顶点数据: {path}")
+        else:
+            offset += dtype.itemsize * count
+    raise ValueError(f"PLY 文件中没有 vertex 元素: {path}")
+
+
+def vertex_xyz(vertices):
+    """返回 (N,3) 坐标数组；x/y/z 为相邻同类型字段时直接返回跨步视图，不复制"""
+    names = vertices.dtype.names
+    fields = vertices.dtype.fields
+    start = names.index('x')
+    if (names[start:start + 3] == ('x', 'y', 'z') and fields['x'][0] == fields['y'][0] == fields['z'][0]
+            and fields['y'][1] == fields['x'][1] + fields['x'][0].itemsize
+            and fields['z'][1] == fields['y'][1] + fields['x'][0].itemsize):
+        return np.ndarray((len(vertices), 3), dtype=fields['x'][0], buffer=vertices,
+                          offset=fields['x'][1], strides=(vertices.dtype.itemsize, fields['x'][0].itemsize))
+    return np.column_stack([vertices['x'], vertices['y'], vertices['z']])
+
+
+def _colored_ply_header(vertex_count, binary):
+    ply_format = "binary_little_endian" if binary else "ascii"
+    return (f"ply\n"
+            f"format {ply_format} 1.0\n"
+            f"element vertex {vertex_count}\n"
+            f"property float x\n"
+            f"property float y\n"
+            f"property float z\n"
+            f"property uchar red\n"
+            f"property uchar green\n"
+            f"property uchar blue\n"
+            f"end_header\n")
+
+
+def colored_vertices(xyz, rgb):
+    """把坐标和颜色数组打包为 COLORED_VERTEX_DTYPE 结构化数组"""
+    vertices = np.empty(len(xyz), dtype=COLORED_VERTEX_DTYPE)
+    vertices['x'] = xyz[:, 0]
+    vertices['y'] = xyz[:, 1]
+    vertices['z'] = xyz[:, 2]
+    vertices['red'] = rgb[:, 0]
+    vertices['green'] = rgb[:, 1]
+    vertices['blue'] = rgb[:, 2]
+    return vertices
+
+
+def write_colored_ply(path, xyz, rgb, binary=True):
+    """写出着色点云；二进制模式一次性写出，ASCII 模式按块批量格式化"""
+    vertices = colored_vertices(xyz, rgb)
+    with open(path, 'wb') as f:
+        f.write(_colored_ply_header(len(vertices), binary).encode('ascii'))
+        if binary:
+            vertices.tofile(f)
+            return
+        # float32 用 %.9g 可无损往返；整块字符串一次格式化，避免逐行 Python 循环
+        for start in range(0, len(vertices), ASCII_CHUNK_ROWS):
+            chunk = vertices[start:start + ASCII_CHUNK_ROWS]
+            table = np.empty((len(chunk), len(COLORED_VERTEX_DTYPE.names)), dtype=object)
+            for column, name in enumerate(COLORED_VERTEX_DTYPE.names):
+                table[:, column] = chunk[name].tolist()
+            f.write((("%.9g %.9g %.9g %d %d %d\n" * len(chunk)) % tuple(table.ravel())).encode('ascii'))
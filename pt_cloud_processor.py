@@ -1,11 +1,21 @@
+import csv
+import multiprocessing
 import subprocess
+import time
+import sys
 import logging
-from pyntcloud import PyntCloud
-from scipy.spatial import KDTree
-from concurrent.futures import as_completed, ProcessPoolExecutor
+from concurrent.futures import as_completed, ProcessPoolExecutor, ThreadPoolExecutor
 import os
 import numpy as np
-import open3d as o3d
+from artifact_cache import DEFAULT_CACHE_MAX_BYTES, ArtifactCache, input_fingerprint
+from batch_manifest import (BatchManifest, STAGING_PREFIX, commit_staged, file_fingerprint, folder_fingerprint,
+                            remove_stale_staged, staged_path)
+from memory_scheduler import (DEFAULT_BYTES_PER_POINT, MemoryBudgetScheduler, default_memory_budget,
+                              estimate_ply_memory)
+from stage_metrics import METRICS_NAME, BatchMetricsWriter, FileMetrics, measure
+from ply_io import ply_vertex_count, read_ply_vertices, vertex_xyz, write_colored_ply
+from curvature_engine import (NeighborGraph, batched_curvatures, curvature_variance, paint_flagged_neighborhoods,
+                              voxel_accuracy_report, voxel_representatives)
 
 # 设置日志记录
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', handlers=[
@@ -14,20 +24,78 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 ])
 logger = logging.getLogger()
 
+# open3d、scipy 等重量级依赖在首次使用时才导入，命令行批处理启动时不加载它们
+
+DEFAULT_DECODER_PATH = "C:\\Users\\alienware\\Desktop\\TestRangeImage\\TestRangeImage.exe"  # 修改为实际路径
+
+# 处理流程自身产生的文件后缀，重新扫描输出文件夹时不能当作解码器输出
+DERIVED_PLY_SUFFIXES = ('_colored.ply', '_filtered_mesh.ply')
+
+# 法向估计和 Poisson 重建的参数，同时作为中间结果缓存键的一部分
+NORMAL_RADIUS = 0.1
+NORMAL_MAX_NN = 30
+POISSON_DEPTH = 9
+
+
+def is_decoder_output(filename):
+    """判断输出文件夹中的文件是否为解码器生成的原始 PLY"""
+    return (filename.endswith('.ply') and not filename.endswith(DERIVED_PLY_SUFFIXES)
+            and not filename.startswith(STAGING_PREFIX))
+
+
+def normalized_densities(densities):
+    """Poisson 密度按最大值归一化到 [0, 1]"""
+    densities = np.asarray(densities)
+    return densities / densities.max() if densities.max() > 0 else densities
+
+
+def density_keep_mask(distances, densities, roi_radius, density_threshold):
+    """密度过滤保留的网格顶点：ROI 半径内没有输入点的顶点密度记为 0，再与阈值比较
+
+    filter_mesh_by_density 和参数扫描共用，扫描预测的保留顶点数与实际过滤一致。
+    """
+    supported = distances <= roi_radius
+    return np.where(supported, densities, 0) >= density_threshold
+
+
 class PLYProcessor:
-    def __init__(self, roi_radius, threshold, erosion_ratio, density_threshold):
+    def __init__(self, roi_radius, threshold, erosion_ratio, density_threshold, binary_ply=True, single_poisson=True,
+                 tile_count=1, tile_min_points=2000000, decoder_path=DEFAULT_DECODER_PATH,
+                 decoder_concurrency=2, metrics_path=None, voxel_size=None, voxel_accuracy_check=False,
+                 cache_dir=None, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES, max_workers=None, memory_budget=None,
+                 bytes_per_point=DEFAULT_BYTES_PER_POINT, worker_max_tasks=20):
         self.roi_radius = roi_radius
         self.threshold = threshold
         self.erosion_ratio = erosion_ratio
         self.density_threshold = density_threshold
+        self.binary_ply = binary_ply  # 着色点云以 binary_little_endian 写出，False 时写 ASCII
+        self.single_poisson = single_poisson  # 每个点云只做一次 Poisson 重建，着色网格通过颜色转移得到
+        self.tile_count = tile_count  # 大点云切分的条带数，1 表示不切分
+        self.tile_min_points = tile_min_points  # 点数达到该值的文件才在进程池中分块处理
+        self.decoder_path = decoder_path
+        self.decoder_concurrency = decoder_concurrency  # 同时运行的解码器进程数
+        self.metrics_path = metrics_path  # 各阶段指标 JSONL 路径，默认写到输出文件夹的 ptcloud_metrics.jsonl
+        self.voxel_size = voxel_size  # 非空时在体素代表点上计算曲率，再传播回原始点
+        self.voxel_accuracy_check = voxel_accuracy_check  # 额外计算全分辨率结果并报告体素模式的精度
+        self.cache_dir = cache_dir  # 中间结果（曲率/方差、法向、Poisson 网格）缓存目录，None 表示不缓存
+        self.cache_max_bytes = cache_max_bytes  # 缓存目录的大小上限，超出时按 LRU 淘汰
+        self.max_workers = max_workers  # 工作进程数，None 表示 CPU 核数减 4（至少 1 个）
+        self.memory_budget = memory_budget  # 同时处理的文件估计内存之和的上限（字节），None 表示可用内存的 80%
+        self.bytes_per_point = bytes_per_point  # 按 PLY 头部顶点数估计内存时每个点的字节数
+        self.worker_max_tasks = worker_max_tasks  # 每个工作进程处理多少个任务后重启，减少内存碎片
+
+    def decoder_command(self, data_folder_path, output_folder_path):
+        """解码器命令行；.py 结尾的解码器（如 fake_range_image.py）用当前解释器运行"""
+        if self.decoder_path.endswith('.py'):
+            return [sys.executable, self.decoder_path, data_folder_path, output_folder_path]
+        return [self.decoder_path, data_folder_path, output_folder_path]
 
     def generate_ply(self, data_folder_path, output_folder_path):
         """运行 TestRangeImage.exe 来生成 PLY 文件"""
-        test_range_image_exe_path = "C:\\Users\\alienware\\Desktop\\TestRangeImage\\TestRangeImage.exe"  # 修改为实际路径
-        command = f'"{test_range_image_exe_path}" "{data_folder_path}" "{output_folder_path}"'
+        command = self.decoder_command(data_folder_path, output_folder_path)
         try:
-            logger.info(f"运行命令: {command}")
-            result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            logger.info(f"运行命令: {subprocess.list2cmdline(command)}")
+            result = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
             logger.info("TestRangeImage.exe 输出:\n%s", result.stdout.decode())
             if result.stderr:
                 logger.error("TestRangeImage.exe 错误:\n%s", result.stderr.decode())
@@ -36,148 +104,490 @@ class PLYProcessor:
                          e.output.decode(), e.stderr.decode())
             raise
 
-    def calculate_curvatures(self, points, tree):
-        """计算点云的曲率"""
-        curvatures = []
-        for point in points[['x', 'y', 'z']].values:
-            idx = tree.query_ball_point(point, self.roi_radius)
-            if len(idx) < 3:
-                curvatures.append(0)
-                continue
-            neighborhood = points.iloc[idx][['x', 'y', 'z']].values
-            distances = np.linalg.norm(neighborhood - point, axis=1)
-            valid_idx = distances <= (1 - self.erosion_ratio) * self.roi_radius
-            neighborhood = neighborhood[valid_idx]
-            if len(neighborhood) < 3:
-                curvatures.append(0)
-                continue
-            covariance = np.cov(neighborhood.T)
-            eigvals = np.linalg.eigvalsh(covariance)
-            curvature = eigvals[0] / np.sum(eigvals)
-            curvatures.append(curvature)
-        return curvatures
-
-    def process_ply_file(self, ply_path, output_folder_path):
-        """处理 PLY 文件，包括着色和生成网格"""
+    def calculate_curvatures(self, xyz, graph):
+        """计算点云的曲率（基于邻域图批量求解协方差特征值）"""
+        return batched_curvatures(xyz, graph, self.roi_radius, self.erosion_ratio)
+
+    def curvature_variance_mask(self, graph, curvatures):
+        """邻域曲率方差超过阈值的点，其整个邻域被标记为红色"""
+        flagged = curvature_variance(graph, curvatures) > float(self.threshold)
+        return paint_flagged_neighborhoods(graph, flagged)
+
+    def curvature_fields(self, xyz, tree, metrics=None):
+        """全分辨率计算曲率、邻域曲率方差和红色标记，返回 (曲率, 红色掩码, 方差)，ROI 半径为 0 时方差为 None"""
+        # 邻域只查询一次，曲率和方差着色共用同一张邻域图
+        with measure(metrics, 'neighbor_graph', points=len(xyz)) as record:
+            graph = NeighborGraph.build(xyz, tree, self.roi_radius)
+            record['edges'] = len(graph.indices)
+        with measure(metrics, 'curvature', points=len(xyz)):
+            curvatures = self.calculate_curvatures(xyz, graph)
+        with measure(metrics, 'variance_coloring', points=len(xyz)):
+            if self.roi_radius == 0:
+                return curvatures, curvatures > self.threshold, None
+            variances = curvature_variance(graph, curvatures)
+            red_mask = paint_flagged_neighborhoods(graph, variances > float(self.threshold))
+        return curvatures, red_mask, variances
+
+    def curvature_colors(self, xyz, tree, metrics=None):
+        """全分辨率计算曲率和红色标记，返回 (曲率, 红色掩码)"""
+        curvatures, red_mask, _ = self.curvature_fields(xyz, tree, metrics)
+        return curvatures, red_mask
+
+    def colors_from_variances(self, xyz, tree, curvatures, variances):
+        """由已知的曲率和方差重新按阈值着色，只为超过阈值的点查询邻域"""
+        if variances is None:
+            return curvatures > self.threshold
+        flagged_ids = np.flatnonzero(variances > float(self.threshold))
+        graph = NeighborGraph.build(xyz, tree, self.roi_radius, query_ids=flagged_ids)
+        return paint_flagged_neighborhoods(graph, np.ones(len(graph), dtype=bool))
+
+    def artifact_cache(self):
+        """按需创建缓存对象；处理器会被序列化到工作进程，因此只保存目录和上限"""
+        return ArtifactCache(self.cache_dir, self.cache_max_bytes) if self.cache_dir else None
+
+    def voxel_curvature_colors(self, xyz, tree=None, metrics=None):
+        """在体素代表点上计算曲率和红色标记，再按最近代表点传播回每个原始点"""
+        from scipy.spatial import KDTree
+        with measure(metrics, 'voxel_downsample', points=len(xyz)) as record:
+            representatives = voxel_representatives(xyz, self.voxel_size)
+            representative_tree = KDTree(representatives)
+            record['representatives'] = len(representatives)
+        logger.info(f"体素下采样: {len(xyz)} 个点 -> {len(representatives)} 个代表点 (体素边长 {self.voxel_size})")
+
+        start = time.perf_counter()
+        representative_curvatures, representative_red = self.curvature_colors(representatives, representative_tree,
+                                                                              metrics)
+        with measure(metrics, 'label_propagation', points=len(xyz)):
+            _, nearest = representative_tree.query(xyz, k=1, workers=-1)
+            curvatures = representative_curvatures[nearest]
+            red_mask = representative_red[nearest]
+        voxel_seconds = time.perf_counter() - start
+
+        if self.voxel_accuracy_check:
+            with measure(metrics, 'voxel_accuracy_check', points=len(xyz)):
+                start = time.perf_counter()
+                full_curvatures, full_red = self.curvature_colors(xyz, tree if tree is not None else KDTree(xyz))
+                full_seconds = time.perf_counter() - start
+                report = voxel_accuracy_report(full_curvatures, full_red, curvatures, red_mask)
+                report['speedup'] = full_seconds / voxel_seconds if voxel_seconds > 0 else None
+            logger.info(f"体素模式精度: 标签一致率 {report['label_agreement']:.4f}，红色精确率 "
+                        f"{report['red_precision']:.4f}，召回率 {report['red_recall']:.4f}，"
+                        f"曲率平均绝对误差 {report['curvature_mae']:.3g}，加速比 {report['speedup'] or 0:.1f}x")
+        return curvatures, red_mask
+
+    def process_ply_file(self, ply_path, output_folder_path, executor=None, metrics=None):
+        """处理 PLY 文件，包括着色和生成网格；传入进程池时按条带并行计算曲率和着色"""
         logger.info(f"处理 PLY 文件: {ply_path}")
-        point_cloud = PyntCloud.from_file(ply_path)
-        points = point_cloud.points
+        with measure(metrics, 'load') as record:
+            # 二进制 PLY 直接内存映射，坐标为映射上的跨步视图，全程只使用 float32/uint8 数组
+            vertices = read_ply_vertices(ply_path)
+            xyz = vertex_xyz(vertices)
+            record['points'] = len(xyz)
 
-        logger.info(f"点云数据加载完成，共 {len(points)} 个点")
+        logger.info(f"点云数据加载完成，共 {len(xyz)} 个点")
 
-        tree = KDTree(points[['x', 'y', 'z']].values)
+        from scipy.spatial import KDTree
+        with measure(metrics, 'kdtree', points=len(xyz)):
+            tree = KDTree(xyz)
 
         if self.roi_radius < 0:
             logger.warning("ROI 半径为负数，使用绝对值进行计算")
             self.roi_radius = abs(self.roi_radius)
 
-        curvatures = self.calculate_curvatures(points, tree)
-
-        points['curvature'] = curvatures
-        points['red'] = 0
-        points['green'] = 0
-        points['blue'] = 0
+        cache = self.artifact_cache()
+        fingerprint = input_fingerprint(ply_path) if cache else None
+        # 曲率和方差只依赖 ROI 半径和侵蚀比例，只改阈值时直接复用
+        curvature_key = (cache.key(fingerprint, 'curvature', roi_radius=self.roi_radius,
+                                   erosion_ratio=self.erosion_ratio) if cache else None)
+        cached = cache.load(curvature_key) if cache and not self.voxel_size else None
 
-        if self.roi_radius == 0:
-            points.loc[points['curvature'] > self.threshold, ['red', 'green', 'blue']] = [255, 0, 0]
+        if self.voxel_size:
+            # 体素模式在代表点上计算，不使用条带并行和曲率缓存（法向和 Poisson 网格缓存仍然有效）
+            if self.tile_count > 1 or cache:
+                logger.info("体素模式: 跳过条带并行和曲率缓存")
+            curvatures, red_mask = self.voxel_curvature_colors(xyz, tree, metrics)
+        elif cached is not None:
+            logger.info("命中曲率缓存，只按阈值重新着色")
+            with measure(metrics, 'variance_coloring', points=len(xyz)) as record:
+                curvatures = cached['curvatures']
+                red_mask = self.colors_from_variances(xyz, tree, curvatures, cached.get('variances'))
+                record['cache_hit'] = True
         else:
-            var_threshold = float(self.threshold)
-            for i, point in points[['x', 'y', 'z']].iterrows():
-                idx = tree.query_ball_point(point.values, self.roi_radius)
-                neighborhood_curvatures = points.iloc[idx]['curvature'].values
-                if len(neighborhood_curvatures) < 2:
-                    continue
-                curvature_variance = np.var(neighborhood_curvatures)
-                if curvature_variance > var_threshold:
-                    points.loc[idx, ['red', 'green', 'blue']] = [255, 0, 0]
+            if executor is not None and self.tile_count > 1:
+                from tile_parallel import tiled_curvature_colors
+                logger.info(f"按 {self.tile_count} 个条带并行计算曲率和着色")
+                with measure(metrics, 'tiled_curvature_coloring', points=len(xyz), tiles=self.tile_count):
+                    curvatures, red_mask, variances = tiled_curvature_colors(xyz, self.roi_radius, self.erosion_ratio,
+                                                                             self.threshold, self.tile_count, executor)
+            else:
+                curvatures, red_mask, variances = self.curvature_fields(xyz, tree, metrics)
+            if cache:
+                arrays = {'curvatures': curvatures} if variances is None else {'curvatures': curvatures,
+                                                                                'variances': variances}
+                cache.save(curvature_key, **arrays)
 
-        points['red'] = np.clip(points['red'], 0, 255)
-        points['green'] = np.clip(points['green'], 0, 255)
-        points['blue'] = np.clip(points['blue'], 0, 255)
+        rgb = np.zeros((len(xyz), 3), dtype=np.uint8)
+        rgb[red_mask] = [255, 0, 0]
 
-        black_points_count = len(points[(points['red'] == 0) & (points['green'] == 0) & (points['blue'] == 0)])
-        red_points_count = len(points[(points['red'] == 255) & (points['green'] == 0) & (points['blue'] == 0)])
-        logger.info(f"未超过曲率阈值点的个数: {black_points_count}")
+        red_points_count = int(np.count_nonzero(red_mask))
+        logger.info(f"未超过曲率阈值点的个数: {len(xyz) - red_points_count}")
         logger.info(f"超过曲率阈值点的个数: {red_points_count}")
 
         output_ply_path = os.path.join(output_folder_path, os.path.basename(ply_path).replace('.ply', '_colored.ply'))
         logger.info(f"输出文件: {output_ply_path}")
-        with open(output_ply_path, 'w') as f:
-            f.write(f"ply\n")
-            f.write(f"format ascii 1.0\n")
-            f.write(f"element vertex {len(points)}\n")
-            f.write(f"property float x\n")
-            f.write(f"property float y\n")
-            f.write(f"property float z\n")
-            f.write(f"property uchar red\n")
-            f.write(f"property uchar green\n")
-            f.write(f"property uchar blue\n")
-            f.write(f"end_header\n")
-            for i, row in points.iterrows():
-                line = f"{row['x']} {row['y']} {row['z']} {int(row['red'])} {int(row['green'])} {int(row['blue'])}\n"
-                f.write(line)
-
-        self.generate_mesh(ply_path, output_folder_path)
-        self.generate_mesh(output_ply_path, output_folder_path, colored=True)
-
-    def generate_mesh(self, ply_path, output_folder_path, colored=False):
-        """生成网格并应用密度过滤"""
-        pcd = o3d.io.read_point_cloud(ply_path)
-        pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=0.1, max_nn=30))
-        mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(pcd, depth=9)
+        with measure(metrics, 'write_colored_ply', points=len(xyz)):
+            write_colored_ply(staged_path(output_ply_path), xyz, rgb, binary=self.binary_ply)
 
-        densities = np.asarray(densities)
-        densities = densities / densities.max() if densities.max() > 0 else densities
+        outputs = [output_ply_path]
+        if self.single_poisson:
+            outputs += self.generate_meshes(ply_path, output_ply_path, output_folder_path, tree, rgb, metrics,
+                                            fingerprint)
+        else:
+            outputs.append(self.generate_mesh(ply_path, output_folder_path, metrics=metrics, fingerprint=fingerprint))
+            outputs.append(self.generate_mesh(output_ply_path, output_folder_path, colored=True,
+                                              source_path=staged_path(output_ply_path), metrics=metrics))
 
-        mesh_vertices = np.asarray(mesh.vertices)
-        vertex_density = np.zeros(len(mesh_vertices))
+        # 所有输出都成功写出后才替换正式文件，中途失败不会留下新旧混杂的结果
+        commit_staged(outputs)
+        return outputs
 
-        for i, vertex in enumerate(mesh_vertices):
-            distances = np.linalg.norm(pcd.points - vertex, axis=1)
-            idx_within_radius = distances <= self.roi_radius
-            if np.sum(idx_within_radius) > 0:
-                vertex_density[i] = np.mean(densities)
+    def poisson_mesh(self, pcd, metrics=None, fingerprint=None):
+        """估计法向并做 Poisson 重建，返回 (网格, 密度)；给出输入指纹且启用缓存时复用法向和网格"""
+        import open3d as o3d
+        cache = self.artifact_cache() if fingerprint is not None else None
+        if cache:
+            poisson_key = cache.key(fingerprint, 'poisson', normal_radius=NORMAL_RADIUS, normal_max_nn=NORMAL_MAX_NN,
+                                    depth=POISSON_DEPTH)
+            cached = cache.load(poisson_key)
+            if cached is not None:
+                with measure(metrics, 'poisson', points=len(pcd.points)) as record:
+                    mesh = o3d.geometry.TriangleMesh(o3d.utility.Vector3dVector(cached['vertices']),
+                                                     o3d.utility.Vector3iVector(cached['triangles']))
+                    if 'vertex_normals' in cached:
+                        mesh.vertex_normals = o3d.utility.Vector3dVector(cached['vertex_normals'])
+                    if 'vertex_colors' in cached:
+                        mesh.vertex_colors = o3d.utility.Vector3dVector(cached['vertex_colors'])
+                    record['vertices'] = len(mesh.vertices)
+                    record['cache_hit'] = True
+                return mesh, cached['densities']
 
-        valid_vertices = vertex_density >= self.density_threshold
-        mesh = mesh.select_by_index(np.where(valid_vertices)[0])
+        with measure(metrics, 'normals', points=len(pcd.points)) as record:
+            normals_key = (cache.key(fingerprint, 'normals', normal_radius=NORMAL_RADIUS, normal_max_nn=NORMAL_MAX_NN)
+                           if cache else None)
+            cached = cache.load(normals_key) if cache else None
+            if cached is not None:
+                pcd.normals = o3d.utility.Vector3dVector(cached['normals'])
+                record['cache_hit'] = True
+            else:
+                pcd.estimate_normals(search_param=o3d.geometry.KDTreeSearchParamHybrid(radius=NORMAL_RADIUS,
+                                                                                       max_nn=NORMAL_MAX_NN))
+                if cache:
+                    cache.save(normals_key, normals=np.asarray(pcd.normals))
+        with measure(metrics, 'poisson', points=len(pcd.points)) as record:
+            mesh, densities = o3d.geometry.TriangleMesh.create_from_point_cloud_poisson(pcd, depth=POISSON_DEPTH)
+            record['vertices'] = len(mesh.vertices)
+        if cache:
+            arrays = {'vertices': np.asarray(mesh.vertices), 'triangles': np.asarray(mesh.triangles),
+                      'densities': np.asarray(densities)}
+            if mesh.has_vertex_normals():
+                arrays['vertex_normals'] = np.asarray(mesh.vertex_normals)
+            if mesh.has_vertex_colors():
+                arrays['vertex_colors'] = np.asarray(mesh.vertex_colors)
+            cache.save(poisson_key, **arrays)
+        return mesh, densities
 
+    def reconstruct_mesh(self, pcd, tree=None, metrics=None, fingerprint=None):
+        """估计法向、Poisson 重建并应用密度过滤"""
+        mesh, densities = self.poisson_mesh(pcd, metrics, fingerprint)
+        with measure(metrics, 'density_filter', vertices=len(mesh.vertices)) as record:
+            mesh = self.filter_mesh_by_density(mesh, densities, pcd.points, tree)
+            record['kept_vertices'] = len(mesh.vertices)
+        return mesh
+
+    def write_mesh(self, mesh, ply_path, output_folder_path, colored=False, metrics=None):
+        """把网格写到临时文件，返回正式输出路径"""
+        import open3d as o3d
         suffix = '_colored_filtered_mesh.ply' if colored else '_original_filtered_mesh.ply'
         output_mesh_path = os.path.join(output_folder_path, os.path.basename(ply_path).replace('.ply', suffix))
-        o3d.io.write_triangle_mesh(output_mesh_path, mesh)
+        with measure(metrics, 'write_mesh', vertices=len(mesh.vertices)):
+            o3d.io.write_triangle_mesh(staged_path(output_mesh_path), mesh)
         logger.info(f"保存网格文件: {output_mesh_path}")
+        return output_mesh_path
+
+    def generate_mesh(self, ply_path, output_folder_path, colored=False, source_path=None, metrics=None,
+                      fingerprint=None):
+        """生成网格并应用密度过滤；source_path 为实际读取的文件（默认即 ply_path），fingerprint 为其缓存指纹"""
+        import open3d as o3d
+        with measure(metrics, 'mesh_load'):
+            pcd = o3d.io.read_point_cloud(source_path or ply_path)
+        mesh = self.reconstruct_mesh(pcd, metrics=metrics, fingerprint=fingerprint)
+        return self.write_mesh(mesh, ply_path, output_folder_path, colored, metrics)
+
+    def generate_meshes(self, ply_path, colored_ply_path, output_folder_path, tree, rgb, metrics=None,
+                        fingerprint=None):
+        """只做一次 Poisson 重建，着色网格的顶点颜色取自最近的输入点"""
+        import open3d as o3d
+        with measure(metrics, 'mesh_load'):
+            pcd = o3d.io.read_point_cloud(ply_path)
+        mesh = self.reconstruct_mesh(pcd, tree, metrics, fingerprint)
+        original_mesh_path = self.write_mesh(mesh, ply_path, output_folder_path, metrics=metrics)
 
-    def process_ply_file_wrapper(self, ply_path, output_folder_path):
-        """封装 process_ply_file 以便在多线程中使用"""
+        with measure(metrics, 'color_transfer', vertices=len(mesh.vertices)):
+            colored_mesh = o3d.geometry.TriangleMesh(mesh)
+            _, nearest = tree.query(np.asarray(colored_mesh.vertices), k=1, workers=-1)
+            colored_mesh.vertex_colors = o3d.utility.Vector3dVector(rgb[nearest] / 255.0)
+        colored_mesh_path = self.write_mesh(colored_mesh, colored_ply_path, output_folder_path, colored=True,
+                                            metrics=metrics)
+        return [original_mesh_path, colored_mesh_path]
+
+    def filter_mesh_by_density(self, mesh, densities, cloud_points, tree=None):
+        """按顶点自身的 Poisson 密度过滤网格，只有 ROI 半径内存在输入点的顶点才计入密度"""
+        densities = normalized_densities(densities)
+
+        # KD 树最近邻查询判断顶点是否有输入点支撑，复杂度约 O(V log N)
+        mesh_vertices = np.asarray(mesh.vertices)
+        if tree is None:
+            from scipy.spatial import KDTree
+            tree = KDTree(np.asarray(cloud_points))
+        distances, _ = tree.query(mesh_vertices, k=1, distance_upper_bound=np.nextafter(self.roi_radius, np.inf),
+                                  workers=-1)
+        valid_vertices = density_keep_mask(distances, densities, self.roi_radius, self.density_threshold)
+        return mesh.select_by_index(np.where(valid_vertices)[0])
+
+    def sweep(self, ply_path, grid, metrics=None):
+        """在一个点云上扫描参数网格，返回每组参数的红色点数和耗时
+
+        grid 为 {'roi_radius': [...], 'threshold': [...], 'erosion_ratio': [...], 'density_threshold': [...]}，
+        缺省的键使用当前实例的参数。点云只加载一次、KD 树只建一次，只在最大半径下查询一次邻域，
+        较小半径的邻域从中按距离筛出；曲率和邻域方差按 (半径, 侵蚀比例) 计算一次，不同阈值只需重新比较和着色。
+        """
+        roi_radii = sorted({abs(r) for r in grid.get('roi_radius', [self.roi_radius])}, reverse=True)
+        erosion_ratios = list(grid.get('erosion_ratio', [self.erosion_ratio]))
+        thresholds = list(grid.get('threshold', [self.threshold]))
+        density_thresholds = list(grid.get('density_threshold', []))
+        if roi_radii[-1] <= 0:
+            raise ValueError("参数扫描要求 ROI 半径大于 0")
+
+        logger.info(f"参数扫描: {ply_path}，共 {len(roi_radii) * len(erosion_ratios) * len(thresholds)} 组参数")
+        with measure(metrics, 'load') as record:
+            xyz = vertex_xyz(read_ply_vertices(ply_path))
+            record['points'] = len(xyz)
+        from scipy.spatial import KDTree
+        with measure(metrics, 'kdtree', points=len(xyz)):
+            tree = KDTree(xyz)
+        with measure(metrics, 'neighbor_graph', points=len(xyz)) as record:
+            max_graph = NeighborGraph.build(xyz, tree, roi_radii[0])
+            record['edges'] = len(max_graph.indices)
+
+        # 密度过滤只影响网格：Poisson 只做一次，顶点到点云的最近距离也只查一次，各组参数只做计数
+        mesh_distances = mesh_densities = None
+        if density_thresholds:
+            mesh_distances, mesh_densities = self.sweep_mesh_densities(ply_path, tree, metrics)
+
+        rows = []
+        for roi_radius in roi_radii:
+            start = time.perf_counter()
+            graph = max_graph.restrict(xyz, roi_radius)
+            graph_seconds = time.perf_counter() - start
+            for erosion_ratio in erosion_ratios:
+                start = time.perf_counter()
+                curvatures = batched_curvatures(xyz, graph, roi_radius, erosion_ratio)
+                curvature_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                variances = curvature_variance(graph, curvatures)
+                variance_seconds = time.perf_counter() - start
+                for threshold in thresholds:
+                    start = time.perf_counter()
+                    red_count = int(np.count_nonzero(paint_flagged_neighborhoods(graph, variances > float(threshold))))
+                    row = {'file': os.path.basename(ply_path), 'points': len(xyz), 'roi_radius': roi_radius,
+                           'erosion_ratio': erosion_ratio, 'threshold': threshold, 'red_count': red_count,
+                           'red_ratio': red_count / len(xyz) if len(xyz) else 0.0,
+                           'graph_seconds': graph_seconds, 'curvature_seconds': curvature_seconds,
+                           'variance_seconds': variance_seconds, 'paint_seconds': time.perf_counter() - start}
+                    if mesh_distances is None:
+                        rows.append(row)
+                        continue
+                    for density_threshold in density_thresholds:
+                        kept = int(np.count_nonzero(density_keep_mask(mesh_distances, mesh_densities, roi_radius,
+                                                                      density_threshold)))
+                        rows.append(dict(row, density_threshold=density_threshold, mesh_vertices=len(mesh_densities),
+                                         kept_vertices=kept))
+        return rows
+
+    def sweep_mesh_densities(self, ply_path, tree, metrics=None):
+        """对原始点云做一次 Poisson 重建，返回各网格顶点到点云的最近距离和归一化密度；open3d 不可用时返回 (None, None)"""
+        try:
+            import open3d as o3d
+        except ImportError as e:
+            logger.warning(f"无法导入 open3d，参数扫描跳过密度阈值: {e}")
+            return None, None
+        pcd = o3d.io.read_point_cloud(ply_path)
+        mesh, densities = self.poisson_mesh(pcd, metrics, input_fingerprint(ply_path) if self.cache_dir else None)
+        distances, _ = tree.query(np.asarray(mesh.vertices), k=1, workers=-1)
+        return distances, normalized_densities(densities)
+
+    def sweep_files(self, ply_paths, grid, output_path=None):
+        """对多个点云执行参数扫描，可选把结果表写成 CSV"""
+        rows = []
+        for ply_path in ply_paths:
+            rows.extend(self.sweep(ply_path, grid))
+        if output_path and rows:
+            fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+            with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+            logger.info(f"参数扫描结果已写入 {output_path}")
+        return rows
+
+    def output_params(self):
+        """影响输出结果的参数，写入清单用于判断输出是否过期"""
+        return {'roi_radius': abs(self.roi_radius), 'threshold': self.threshold, 'erosion_ratio': self.erosion_ratio,
+                'density_threshold': self.density_threshold, 'binary_ply': self.binary_ply,
+                'single_poisson': self.single_poisson, 'voxel_size': self.voxel_size}
+
+    def processor_params(self):
+        """重建处理器所需的构造参数，提交到工作进程时只传递这些轻量参数"""
+        return {'roi_radius': self.roi_radius, 'threshold': self.threshold, 'erosion_ratio': self.erosion_ratio,
+                'density_threshold': self.density_threshold, 'binary_ply': self.binary_ply,
+                'single_poisson': self.single_poisson, 'tile_count': self.tile_count,
+                'tile_min_points': self.tile_min_points, 'decoder_path': self.decoder_path,
+                'decoder_concurrency': self.decoder_concurrency, 'metrics_path': self.metrics_path,
+                'voxel_size': self.voxel_size, 'voxel_accuracy_check': self.voxel_accuracy_check,
+                'cache_dir': self.cache_dir, 'cache_max_bytes': self.cache_max_bytes}
+
+    def process_ply_file_wrapper(self, ply_path, output_folder_path, executor=None):
+        """封装 process_ply_file 以便在多线程中使用，返回输出文件列表和各阶段指标，失败时 outputs 为 None"""
+        metrics = FileMetrics(ply_path)
         try:
-            self.process_ply_file(ply_path, output_folder_path)
+            outputs = self.process_ply_file(ply_path, output_folder_path, executor, metrics)
+            return {'outputs': outputs, 'metrics': metrics.to_dict()}
         except Exception as e:
             logger.error(f"处理文件 {ply_path} 时出错: {e}")
+            return {'outputs': None, 'metrics': metrics.to_dict('failed', e)}
+
+    def decode_subfolder(self, subdir_path, output_subfolder, manifest):
+        """运行解码器并返回原始 PLY 列表；数据未变化且输出仍在时跳过解码"""
+        key = 'decode/' + manifest.key(output_subfolder)
+        fingerprint = folder_fingerprint(subdir_path)
+        params = {'decoder_path': self.decoder_path}
+        remove_stale_staged(output_subfolder)
+
+        if manifest.is_up_to_date(key, fingerprint, params):
+            logger.info(f"解码结果已是最新，跳过解码: {subdir_path}")
+        else:
+            manifest.mark_running(key, fingerprint, params)
+            try:
+                self.generate_ply(subdir_path, output_subfolder)
+            except Exception as e:
+                manifest.mark_failed(key, fingerprint, params, e)
+                raise
+
+        raw_plys = [os.path.join(output_subfolder, filename) for filename in sorted(os.listdir(output_subfolder))
+                    if is_decoder_output(filename)]
+        manifest.mark_done(key, fingerprint, params, raw_plys)
+        return raw_plys
+
+    def submit_ply_file(self, ply_path, output_subfolder, executor, tile_scheduler, memory_scheduler):
+        """按估计内存登记一个原始 PLY；超大点云交给父进程线程，其条带任务再提交到同一个进程池"""
+        cost = estimate_ply_memory(ply_path, self.bytes_per_point)
+        if self.tile_count > 1 and ply_vertex_count(ply_path) >= self.tile_min_points:
+            return memory_scheduler.submit(cost, tile_scheduler, self.process_ply_file_wrapper, ply_path,
+                                           output_subfolder, executor)
+        return memory_scheduler.submit(cost, executor, process_ply_job, self.processor_params(), ply_path,
+                                       output_subfolder)
+
+    def worker_count(self):
+        """工作进程数：默认 CPU 核数减 4，至少 1 个，最多 100 个"""
+        if self.max_workers:
+            return self.max_workers
+        return max(1, min((os.cpu_count() or 1) - 4, 100))
+
+    def create_executor(self, max_workers):
+        """创建进程池：使用 spawn 启动方式（与 Windows 一致，也避免在多线程父进程中 fork 导致死锁），
+        Python 3.11 及以上每个工作进程处理 worker_max_tasks 个任务后重启"""
+        kwargs = {'max_workers': max_workers, 'mp_context': multiprocessing.get_context('spawn')}
+        if self.worker_max_tasks:
+            if sys.version_info >= (3, 11):
+                kwargs['max_tasks_per_child'] = self.worker_max_tasks
+            else:
+                logger.warning("Python 3.11 以下的进程池不支持 max_tasks_per_child，工作进程不会定期重启")
+        return ProcessPoolExecutor(**kwargs)
 
     def process_all_subfolders(self, root_folder_path, output_folder_path):
-        """处理根文件夹下的所有子文件夹"""
-        max_workers = min(os.cpu_count() - 4, 100)  # 动态设置线程数
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
+        """处理根文件夹下的所有子文件夹：解码器并发运行，每个子文件夹解码完成后立即提交其 PLY
 
-            for subdir in os.listdir(root_folder_path):
+        输出清单记录每个文件的输入指纹和参数，已是最新的文件直接跳过，过期、失败或中断的文件重新处理。
+        """
+        os.makedirs(output_folder_path, exist_ok=True)
+        manifest = BatchManifest(output_folder_path)
+        metrics_writer = BatchMetricsWriter(self.metrics_path or os.path.join(output_folder_path, METRICS_NAME))
+        params = self.output_params()
+        max_workers = self.worker_count()
+        memory_budget = self.memory_budget or default_memory_budget()
+        logger.info(f"工作进程数: {max_workers}，内存预算: {memory_budget / 1024 ** 3:.1f} GB")
+        if self.voxel_size and (self.tile_count > 1 or self.cache_dir):
+            logger.warning("已开启体素模式: 曲率不按条带并行计算（忽略 tile_count），也不写入或读取曲率缓存；"
+                           "法向和 Poisson 网格缓存仍然有效")
+        memory_scheduler = MemoryBudgetScheduler(memory_budget, max_workers)
+        # 清单最先进入、最后退出：所有任务结束（或出错中止）后再写回一次
+        with manifest, self.create_executor(max_workers) as executor, ThreadPoolExecutor() as tile_scheduler, \
+                ThreadPoolExecutor(max_workers=self.decoder_concurrency) as decoder_pool:
+            decode_futures = {}
+            for subdir in sorted(os.listdir(root_folder_path)):
                 subdir_path = os.path.join(root_folder_path, subdir)
                 if os.path.isdir(subdir_path):
                     output_subfolder = os.path.join(output_folder_path, subdir)
                     os.makedirs(output_subfolder, exist_ok=True)
 
                     logger.info(f"处理子文件夹: {subdir_path}")
-                    self.generate_ply(subdir_path, output_subfolder)
+                    decode_futures[decoder_pool.submit(self.decode_subfolder, subdir_path, output_subfolder,
+                                                       manifest)] = output_subfolder
 
-                    for filename in os.listdir(output_subfolder):
-                        if filename.endswith('.ply'):
-                            ply_path = os.path.join(output_subfolder, filename)
-                            futures.append(executor.submit(self.process_ply_file_wrapper, ply_path, output_subfolder))
+            futures = {}
+            skipped_count = 0
+            for decode_future in as_completed(decode_futures):
+                output_subfolder = decode_futures[decode_future]
+                try:
+                    raw_plys = decode_future.result()
+                except Exception as e:
+                    logger.error(f"解码失败，跳过子文件夹 {output_subfolder}: {e}")
+                    continue
 
+                for ply_path in raw_plys:
+                    key = manifest.key(ply_path)
+                    fingerprint = file_fingerprint(ply_path)
+                    if manifest.is_up_to_date(key, fingerprint, params):
+                        skipped_count += 1
+                        continue
+                    manifest.mark_running(key, fingerprint, params)
+                    future = self.submit_ply_file(ply_path, output_subfolder, executor, tile_scheduler,
+                                                  memory_scheduler)
+                    futures[future] = (key, fingerprint)
+                manifest.flush()
+
+            logger.info(f"需要处理 {len(futures)} 个文件，跳过 {skipped_count} 个已是最新的文件")
             for future in as_completed(futures):
+                key, fingerprint = futures[future]
                 try:
-                    future.result()
+                    result = future.result()
                 except Exception as e:
+                    manifest.mark_failed(key, fingerprint, params, e)
                     logger.error(f"处理过程中发生了异常: {e}")
+                    continue
+                metrics_writer.add_file(result['metrics'])
+                if result['outputs'] is None:
+                    manifest.mark_failed(key, fingerprint, params, result['metrics'].get('error'))
+                else:
+                    manifest.mark_done(key, fingerprint, params, result['outputs'])
+            memory_scheduler.shutdown()
+
+        metrics_writer.write_summary()
+
+
+def process_ply_job(processor_params, ply_path, output_folder_path):
+    """工作进程入口：只接收构造参数，在进程内重建处理器，避免每次提交都序列化整个处理器"""
+    return PLYProcessor(**processor_params).process_ply_file_wrapper(ply_path, output_folder_path)
 
 # 示例使用
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger()
+
+METRICS_NAME = 'ptcloud_metrics.jsonl'
+
+
+def peak_rss_bytes():
+    """当前进程的峰值常驻内存（字节）；无法获取时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, 'peak_wset', memory_info.rss)
+    except ImportError:
+        return None
+
+
+class FileMetrics:
+    """单个文件各处理阶段的墙钟时间、CPU 时间、点/顶点数和峰值 RSS
+
+    峰值 RSS 是所在工作进程到该阶段结束为止的峰值，同一进程处理过的更大文件也会反映在其中。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stages = []
+        self.start_time = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, **counts):
+        """计时一个阶段；yield 出的字典可在阶段内补充计数（如顶点数）"""
+        record = {'stage': name, **counts}
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            record['peak_rss'] = peak_rss_bytes()
+            self.stages.append(record)
+
+    def to_dict(self, status='done', error=None):
+        result = {'type': 'file', 'file': self.path, 'pid': os.getpid(), 'status': status,
+                  'wall_seconds': time.perf_counter() - self.start_time, 'stages': self.stages}
+        if error is not None:
+            result['error'] = str(error)
+        return result
+
+
+def measure(metrics, name, **counts):
+    """metrics 为 None 时不计时，便于在可选指标的方法中统一写法"""
+    return metrics.stage(name, **counts) if metrics is not None else nullcontext({})
+
+
+class BatchMetricsWriter:
+    """在父进程中把各工作进程返回的文件指标追加写入 JSONL，并在结束时写出批次汇总"""
+
+    def __init__(self, path):
+        self.path = path
+        self.batch_id = time.strftime('%Y%m%d-%H%M%S')
+        self.files = []
+
+    def write(self, record):
+        record = dict(record, batch_id=self.batch_id)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def add_file(self, file_record):
+        self.files.append(file_record)
+        self.write(file_record)
+
+    def write_summary(self, top_count=5):
+        """汇总最慢的文件和累计耗时最多的阶段"""
+        stage_totals = {}
+        for file_record in self.files:
+            for stage in file_record['stages']:
+                total = stage_totals.setdefault(stage['stage'], {'wall_seconds': 0.0, 'cpu_seconds': 0.0, 'files': 0})
+                total['wall_seconds'] += stage['wall_seconds']
+                total['cpu_seconds'] += stage['cpu_seconds']
+                total['files'] += 1
+
+        slowest_files = sorted(self.files, key=lambda r: r['wall_seconds'], reverse=True)[:top_count]
+        slowest_stages = sorted(stage_totals.items(), key=lambda item: item[1]['wall_seconds'], reverse=True)
+        summary = {
+            'type': 'summary',
+            'file_count': len(self.files),
+            'failed_count': sum(1 for r in self.files if r['status'] != 'done'),
+            'slowest_files': [{'file': r['file'], 'wall_seconds': r['wall_seconds'],
+                               'slowest_stage': max(r['stages'], key=lambda s: s['wall_seconds'])['stage']
+                               if r['stages'] else None} for r in slowest_files],
+            'stage_totals': [dict(total, stage=name) for name, total in slowest_stages],
+            'max_peak_rss': max((s['peak_rss'] or 0 for r in self.files for s in r['stages']), default=0),
+        }
+        self.write(summary)
+
+        logger.info(f"批次汇总: 共 {summary['file_count']} 个文件，失败 {summary['failed_count']} 个")
+        for item in summary['slowest_files']:
+            logger.info(f"最慢文件: {item['file']} 耗时 {item['wall_seconds']:.1f} s（最慢阶段 {item['slowest_stage']}）")
+        for item in summary['stage_totals'][:top_count]:
+            logger.info(f"阶段 {item['stage']}: 累计 {item['wall_seconds']:.1f} s，涉及 {item['files']} 个文件")
+        return summary
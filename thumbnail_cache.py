@@ -0,0 +1,183 @@
+"""图片缩略图的后台解码与缓存
+
+界面线程只做缓存查找和 QPixmap.fromImage；读图和缩放在线程池中完成（QImage 可以跨线程使用，QPixmap 不行）。
+解码后的缩略图放在按字节数限制的 LRU 中，可选地再以 PNG 保存到磁盘，下次启动直接读取小图。
+"""
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from PyQt5 import QtCore, QtGui
+
+logger = logging.getLogger()
+
+DEFAULT_THUMBNAIL_CACHE_BYTES = 256 * 1024 ** 2
+DEFAULT_DISK_CACHE_BYTES = 1024 ** 3
+
+# 当前组的图片优先于相邻组的预取
+PRIORITY_VISIBLE = 1
+PRIORITY_PREFETCH = 0
+
+
+def thumbnail_key(image_path, size, file_stat=None):
+    """缓存键：绝对路径、文件大小、修改时间和目标尺寸，图片被修改后自然失效
+
+    给出 file_stat（数据集索引中的 (大小, 修改时间)）时不访问磁盘。
+    """
+    if file_stat is None:
+        stat = os.stat(image_path)
+        file_stat = (stat.st_size, stat.st_mtime_ns)
+    return (os.path.abspath(image_path),) + tuple(file_stat) + (size.width(), size.height())
+
+
+def decode_thumbnail(image_path, size):
+    """读取图片并按比例缩放到 size 以内，失败时返回空 QImage"""
+    reader = QtGui.QImageReader(image_path)
+    if reader.supportsOption(QtGui.QImageIOHandler.ScaledSize) and reader.size().isValid():
+        # 支持的格式（如 JPEG）在解码时直接降采样
+        reader.setScaledSize(reader.size().scaled(size, QtCore.Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    return image.scaled(size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+
+
+def evict_disk_cache(cache_dir, max_bytes):
+    """磁盘缩略图总大小超过上限时删除最久未使用的文件"""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.png'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+class ThumbnailSignals(QtCore.QObject):
+    # QRunnable 不是 QObject，解码结果通过界面线程中创建的信号对象以排队连接送回
+    decoded = QtCore.pyqtSignal(object, str, QtGui.QImage)  # 缓存键, 图片路径, 缩略图
+
+
+class ThumbnailTask(QtCore.QRunnable):
+    def __init__(self, key, image_path, size, disk_cache_dir, signals):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.key = key
+        self.image_path = image_path
+        self.size = size
+        self.disk_cache_dir = disk_cache_dir
+        self.signals = signals
+
+    def disk_path(self):
+        digest = hashlib.sha1(repr(self.key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_cache_dir, digest + '.png')
+
+    def run(self):
+        image = QtGui.QImage()
+        if self.disk_cache_dir:
+            disk_path = self.disk_path()
+            if os.path.exists(disk_path):
+                image = QtGui.QImage(disk_path)
+                if not image.isNull():
+                    try:
+                        os.utime(disk_path)
+                    except OSError:
+                        pass
+        if image.isNull():
+            image = decode_thumbnail(self.image_path, self.size)
+            if not image.isNull() and self.disk_cache_dir:
+                self.save_to_disk(image)
+        self.signals.decoded.emit(self.key, self.image_path, image)
+
+    def save_to_disk(self, image):
+        disk_path = self.disk_path()
+        tmp_path = f"{disk_path}.{os.getpid()}.{id(self)}.tmp.png"
+        try:
+            if image.save(tmp_path, 'PNG'):
+                os.replace(tmp_path, disk_path)
+        except OSError as e:
+            # 磁盘缓存写入失败不影响显示
+            logger.warning(f"写入缩略图缓存失败: {disk_path} ({e})")
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+
+class ThumbnailLoader(QtCore.QObject):
+    """缩略图加载器：request 命中内存缓存时直接返回 QImage，否则排队解码，完成后发出 thumbnail_ready"""
+    thumbnail_ready = QtCore.pyqtSignal(str, QtGui.QImage)  # 图片路径, 缩略图（读取失败时为空）
+
+    def __init__(self, max_bytes=DEFAULT_THUMBNAIL_CACHE_BYTES, disk_cache_dir=None,
+                 disk_max_bytes=DEFAULT_DISK_CACHE_BYTES, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self.disk_cache_dir = disk_cache_dir
+        self.cache = OrderedDict()  # 缓存键 -> QImage，按最近使用排序
+        self.cache_bytes = 0
+        # 缓存键 -> ThumbnailTask；任务未设置自动删除，运行结束前必须保留引用
+        self.in_flight = {}
+        self.pool = QtCore.QThreadPool(self)
+        self.signals = ThumbnailSignals()
+        self.signals.decoded.connect(self.on_decoded)
+        if disk_cache_dir:
+            os.makedirs(disk_cache_dir, exist_ok=True)
+            evict_disk_cache(disk_cache_dir, disk_max_bytes)
+
+    def request(self, image_path, size, priority=PRIORITY_VISIBLE, file_stat=None):
+        """返回已缓存的缩略图；未缓存时排队解码并返回 None"""
+        try:
+            key = thumbnail_key(image_path, size, file_stat)
+        except OSError:
+            logger.error(f"Failed to load image: {image_path}")
+            return None
+        image = self.cache.get(key)
+        if image is not None:
+            self.cache.move_to_end(key)
+            return image
+        if key not in self.in_flight:
+            task = ThumbnailTask(key, image_path, size, self.disk_cache_dir, self.signals)
+            self.in_flight[key] = task
+            self.pool.start(task, priority)
+        return None
+
+    def cancel_pending(self):
+        """丢弃尚未开始的解码任务（切换到其他组时调用），正在运行的任务完成后仍会进入缓存"""
+        for key, task in list(self.in_flight.items()):
+            # tryTake 只移除还在队列中的任务
+            if self.pool.tryTake(task):
+                del self.in_flight[key]
+
+    def on_decoded(self, key, image_path, image):
+        self.in_flight.pop(key, None)
+        if image.isNull():
+            logger.error(f"Failed to load image: {image_path}")
+        else:
+            self.store(key, image)
+        self.thumbnail_ready.emit(image_path, image)
+
+    def store(self, key, image):
+        if key in self.cache:
+            self.cache_bytes -= self.cache.pop(key).sizeInBytes()
+        self.cache[key] = image
+        self.cache_bytes += image.sizeInBytes()
+        while self.cache_bytes > self.max_bytes and len(self.cache) > 1:
+            _, evicted = self.cache.popitem(last=False)
+            self.cache_bytes -= evicted.sizeInBytes()
+
+    def shutdown(self):
+        """关闭窗口时调用，等待正在运行的任务结束"""
+        self.cancel_pending()
+        self.pool.waitForDone()
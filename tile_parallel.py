@@ -0,0 +1,118 @@
+from multiprocessing import shared_memory
+import numpy as np
+from scipy.spatial import KDTree
+from curvature_engine import NeighborGraph, batched_curvatures, curvature_variance, paint_flagged_neighborhoods
+
+
+def plan_tiles(xyz, tile_count):
+    """沿包围盒最长轴按分位数切成点数相近的条带，返回 (axis, [(lo, hi), ...])"""
+    extent = xyz.max(axis=0) - xyz.min(axis=0)
+    axis = int(np.argmax(extent))
+    cuts = np.quantile(xyz[:, axis], np.linspace(0, 1, tile_count + 1)[1:-1])
+    bounds = np.concatenate([[-np.inf], np.unique(cuts), [np.inf]])
+    return axis, list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def _create_shared(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach_shared(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _tile_points(xyz, axis, lo, hi, halo):
+    """返回条带内核心点和带 halo 的点的全局索引（均为升序）"""
+    coord = xyz[:, axis]
+    core_ids = np.flatnonzero((coord >= lo) & (coord < hi))
+    halo_ids = np.flatnonzero((coord >= lo - halo) & (coord <= hi + halo))
+    return core_ids, halo_ids
+
+
+def _tile_graph(xyz, axis, lo, hi, roi_radius):
+    """在 halo 点上建树，只为核心点查询邻域；halo 为 roi_radius 即可覆盖核心点的全部邻点"""
+    core_ids, halo_ids = _tile_points(xyz, axis, lo, hi, roi_radius)
+    local_xyz = xyz[halo_ids]
+    query_ids = np.searchsorted(halo_ids, core_ids)
+    graph = NeighborGraph.build(local_xyz, KDTree(local_xyz), roi_radius, query_ids=query_ids)
+    return core_ids, halo_ids, local_xyz, graph
+
+
+def _tile_curvature_task(xyz_spec, curvature_spec, axis, lo, hi, roi_radius, erosion_ratio):
+    """第一阶段：计算条带核心点的曲率，写入共享数组"""
+    xyz_shm, xyz = _attach_shared(xyz_spec)
+    curvature_shm, curvatures = _attach_shared(curvature_spec)
+    try:
+        core_ids, _, local_xyz, graph = _tile_graph(xyz, axis, lo, hi, roi_radius)
+        curvatures[core_ids] = batched_curvatures(local_xyz, graph, roi_radius, erosion_ratio)
+        return len(core_ids)
+    finally:
+        del xyz, curvatures
+        xyz_shm.close()
+        curvature_shm.close()
+
+
+def _tile_color_task(xyz_spec, curvature_spec, variance_spec, red_spec, axis, lo, hi, roi_radius, threshold):
+    """第二阶段：计算核心点的邻域曲率方差写入共享数组，把超阈值点的整个邻域写入共享红色掩码"""
+    xyz_shm, xyz = _attach_shared(xyz_spec)
+    curvature_shm, curvatures = _attach_shared(curvature_spec)
+    variance_shm, variances = _attach_shared(variance_spec)
+    red_shm, red = _attach_shared(red_spec)
+    try:
+        core_ids, halo_ids, _, graph = _tile_graph(xyz, axis, lo, hi, roi_radius)
+        variances[core_ids] = curvature_variance(graph, curvatures[halo_ids])
+        flagged = variances[core_ids] > float(threshold)
+        # 不同条带可能同时把同一个点置 1，写入的值相同，无需加锁
+        red[halo_ids[paint_flagged_neighborhoods(graph, flagged)]] = 1
+        return int(np.count_nonzero(flagged))
+    finally:
+        del xyz, curvatures, variances, red
+        xyz_shm.close()
+        curvature_shm.close()
+        variance_shm.close()
+        red_shm.close()
+
+
+def tiled_curvature_colors(xyz, roi_radius, erosion_ratio, threshold, tile_count, executor):
+    """把点云切成带 halo 的条带在进程池中并行计算曲率和方差着色，结果与不分块完全一致
+
+    返回 (曲率, 红色掩码, 邻域曲率方差)，ROI 半径为 0 时方差为 None。
+    """
+    axis, tiles = plan_tiles(xyz, tile_count)
+    shared = []
+    try:
+        xyz_shm, xyz_spec = _create_shared(np.ascontiguousarray(xyz))
+        shared.append(xyz_shm)
+        curvature_shm, curvature_spec = _create_shared(np.zeros(len(xyz), dtype=np.float64))
+        shared.append(curvature_shm)
+        variance_shm, variance_spec = _create_shared(np.full(len(xyz), np.nan, dtype=np.float64))
+        shared.append(variance_shm)
+        red_shm, red_spec = _create_shared(np.zeros(len(xyz), dtype=np.uint8))
+        shared.append(red_shm)
+
+        # 方差需要邻点的曲率，因此两个阶段之间必须等待所有条带完成
+        futures = [executor.submit(_tile_curvature_task, xyz_spec, curvature_spec, axis, lo, hi, roi_radius,
+                                   erosion_ratio) for lo, hi in tiles]
+        for future in futures:
+            future.result()
+        curvatures = np.ndarray(len(xyz), dtype=np.float64, buffer=curvature_shm.buf).copy()
+
+        if roi_radius == 0:
+            return curvatures, curvatures > threshold, None
+
+        futures = [executor.submit(_tile_color_task, xyz_spec, curvature_spec, variance_spec, red_spec, axis, lo, hi,
+                                   roi_radius, threshold) for lo, hi in tiles]
+        for future in futures:
+            future.result()
+        red_mask = np.ndarray(len(xyz), dtype=np.uint8, buffer=red_shm.buf).astype(bool)
+        variances = np.ndarray(len(xyz), dtype=np.float64, buffer=variance_shm.buf).copy()
+        return curvatures, red_mask, variances
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
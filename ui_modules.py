@@ -1,12 +1,20 @@
 import logging
+import multiprocessing
 import os
 import re
-import shutil
 import sys
-import cv2
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 import open3d as o3d
 from PyQt5 import QtWidgets, QtGui, QtCore
 import ctypes
+from bulk_export import ARCHIVE_MODES, archive_path, export_files
+from dataset_index import DatasetIndex
+from exposure_detector import exposure_scan_tasks, overexposed_groups, scan_exposure_group
+from exposure_index import MAX_INDEXED_RUN, ExposureIndex, compute_exposure_entries
+from geometry_cache import (DEFAULT_LOD_POINT_BUDGET, DEFAULT_LOD_TRIANGLE_BUDGET, GEOMETRY_PRIORITY_PREFETCH,
+                            GeometryLoader, is_mesh_file)
+from thumbnail_cache import PRIORITY_PREFETCH, ThumbnailLoader
 
 # 设置日志记录
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', handlers=[
@@ -15,6 +23,8 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 ])
 logger = logging.getLogger()
 
+# 细节层次模式下，在一个组停留多久（毫秒）后换成完整模型
+LOD_REFINE_DELAY_MS = 500
 
 
 class ExposureDialog(QtWidgets.QDialog):
@@ -54,43 +64,259 @@ class ExposureDialog(QtWidgets.QDialog):
         }
 
 
+class LodBudgetDialog(QtWidgets.QDialog):
+    def __init__(self, point_budget, triangle_budget, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("设置细节层次预算")
+
+        # 创建布局
+        layout = QtWidgets.QFormLayout(self)
+
+        # 创建输入字段，预算对每个显示窗口分别生效
+        self.point_budget_input = QtWidgets.QLineEdit(str(point_budget), self)
+        self.point_budget_input.setValidator(QtGui.QIntValidator(1000, 100000000, self))
+
+        self.triangle_budget_input = QtWidgets.QLineEdit(str(triangle_budget), self)
+        self.triangle_budget_input.setValidator(QtGui.QIntValidator(1000, 100000000, self))
+
+        # 将输入字段添加到布局
+        layout.addRow("每个窗口的点数预算:", self.point_budget_input)
+        layout.addRow("每个窗口的三角形数预算:", self.triangle_budget_input)
+
+        # 添加按钮
+        button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, self)
+        layout.addWidget(button_box)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+
+    def get_values(self):
+        return {
+            "point_budget": int(self.point_budget_input.text()),
+            "triangle_budget": int(self.triangle_budget_input.text())
+        }
+
+
+class ExportDialog(QtWidgets.QDialog):
+    # 导出方式 -> 显示名称
+    MODE_NAMES = {
+        'copy': "复制",
+        'hardlink': "硬链接（不占额外空间，与原图是同一文件，需在同一磁盘）",
+        'reflink': "reflink 克隆（写时复制，文件系统不支持时复制）",
+        'tar': "打包为 tar 归档",
+        'zip': "打包为 zip 归档",
+    }
+
+    def __init__(self, mode='copy', parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("选择导出方式")
+
+        # 创建布局
+        layout = QtWidgets.QFormLayout(self)
+
+        # 创建导出方式选择框
+        self.mode_input = QtWidgets.QComboBox(self)
+        for export_mode, name in self.MODE_NAMES.items():
+            self.mode_input.addItem(name, export_mode)
+        self.mode_input.setCurrentIndex(max(self.mode_input.findData(mode), 0))
+
+        # 将输入字段添加到布局
+        layout.addRow("导出方式:", self.mode_input)
+
+        # 添加按钮
+        button_box = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel, self)
+        layout.addWidget(button_box)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+
+    def get_values(self):
+        return {
+            "mode": self.mode_input.currentData()
+        }
+
+
 class ImageDelegate(QtWidgets.QStyledItemDelegate):
+    # 组状态，同时缺少 PLY 和过曝时显示缺少 PLY
+    STATUS_MISSING_PLY = 1
+    STATUS_OVEREXPOSED = 2
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.missing_ply_group_names = set()
         self.overexposed_group_names = set()
+        # 组名 -> 状态，在名称集合变化时更新，paint 中只做一次字典查找
+        self.group_status = {}
+        self.alert_icon = None
+        self.exposure_icon = None
         logger.info("ImageDelegate 初始化完成")
 
     def set_missing_ply_group_names(self, missing_ply_group_names):
         self.missing_ply_group_names.update(missing_ply_group_names)
-        logger.info(f"缺失 PLY 组名称已更新: {self.missing_ply_group_names}")
+        for group_name in missing_ply_group_names:
+            self.group_status[group_name] = self.STATUS_MISSING_PLY
+        logger.info(f"缺失 PLY 组名称已更新: 共 {len(self.missing_ply_group_names)} 个")
 
     def set_overexposed_group_names(self, overexposed_group_names):
         self.overexposed_group_names.update(overexposed_group_names)
-        logger.info(f"过曝组名称已更新: {self.overexposed_group_names}")
+        for group_name in overexposed_group_names:
+            self.group_status.setdefault(group_name, self.STATUS_OVEREXPOSED)
+        logger.info(f"过曝组名称已更新: 共 {len(self.overexposed_group_names)} 个")
 
     def paint(self, painter, option, index):
         super().paint(painter, option, index)
-        style = QtWidgets.QApplication.style()
-        if index.isValid():
-            item_text = index.data(QtCore.Qt.DisplayRole)
+        # 每次重绘每一行都会调用，这里不做遍历、日志或磁盘访问
+        status = self.group_status.get(index.data(QtCore.Qt.DisplayRole))
+        if status is None:
+            return
+        if self.alert_icon is None:
+            style = QtWidgets.QApplication.style()
+            self.alert_icon = style.standardIcon(QtWidgets.QStyle.SP_BrowserStop)
+            self.exposure_icon = style.standardIcon(QtWidgets.QStyle.SP_MessageBoxWarning)
 
-            if item_text:
-                # 检查警告图标绘制
+        # 检查警告图标绘制
+        if status == self.STATUS_MISSING_PLY:
+            self.alert_icon.paint(painter, option.rect.adjusted(option.rect.width() - 20, 0, 50, 0))
 
-                if any(item_text in group_name for group_name in self.missing_ply_group_names):
-                    alert_icon = style.standardIcon(QtWidgets.QStyle.SP_BrowserStop)
-                    alert_icon.paint(painter, option.rect.adjusted(option.rect.width() - 20, 0, 50, 0))
-                    logger.info(
-                        f"绘制警告图标于: {item_text} (位置: {option.rect.adjusted(option.rect.width() - 20, 0, 50, 0)})")
+        # 检查曝光图标绘制
+        else:
+            self.exposure_icon.paint(painter, option.rect.adjusted(option.rect.width() - 40, 0, 50, 0))
+
+
+class ExposureScanWorker(QtCore.QObject):
+    """在后台线程中用进程池检测所有数据文件夹的过曝情况，每完成一个组就回报一次
+
+    过曝索引中已有最新统计的组直接在本线程中得出结果，只有缺失或过期的图片交给进程池读取。
+    """
+    progress = QtCore.pyqtSignal(int, int)  # 已完成的组数, 总组数
+    group_overexposed = QtCore.pyqtSignal(str, int)  # 过曝组名, 过曝行数之和
+    finished = QtCore.pyqtSignal(int, bool)  # 过曝组数, 是否被取消
 
-                # 检查曝光图标绘制
+    def __init__(self, input_folder, exposure_threshold, continuous_pixel_count, max_exposure_count,
+                 exposure_index=None):
+        super().__init__()
+        self.input_folder = input_folder
+        self.exposure_index = exposure_index
+        self.exposure_threshold = exposure_threshold
+        self.continuous_pixel_count = continuous_pixel_count
+        self.max_exposure_count = max_exposure_count
+        self.cancel_event = threading.Event()
+        self.done_count = 0  # 已完成的组数
+        self.overexposed_count = 0  # 过曝组数
+        self.total = 0  # 总组数
+
+    def cancel(self):
+        """可从界面线程直接调用"""
+        self.cancel_event.set()
+
+    def run(self):
+        self.overexposed_count = 0
+        self.done_count = 0
+        self.total = 0
+        try:
+            self.scan()
+        except Exception as e:
+            # 任何错误都要发出 finished，否则界面一直认为扫描仍在进行
+            logger.error(f"过曝扫描出错: {e}")
+
+        cancelled = self.cancel_event.is_set()
+        logger.info(f"过曝扫描{'已取消' if cancelled else '完成'}: 已检测 {self.done_count}/{self.total} 个组，"
+                    f"过曝 {self.overexposed_count} 个组")
+        self.finished.emit(self.overexposed_count, cancelled)
+
+    def scan(self):
+        tasks = exposure_scan_tasks(self.input_folder)
+        total = self.total = len(tasks)
+        logger.info(f"开始扫描所有数据的过曝情况，共 {total} 个组")
+        self.progress.emit(0, total)
+
+        use_index = self.exposure_index is not None and self.continuous_pixel_count <= MAX_INDEXED_RUN
+        max_workers = max(1, min((os.cpu_count() or 1) - 1, 32))
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            pending = {}
+            for tiff_folder_path, group_name, tiff_files in tasks:
+                # 逐组检查索引也要对文件逐个 stat，数据很多时需要及时响应取消
+                if self.cancel_event.is_set():
+                    break
+                if not use_index:
+                    future = executor.submit(scan_exposure_group, tiff_folder_path, group_name, tiff_files,
+                                             self.exposure_threshold, self.continuous_pixel_count)
+                    pending[future] = (tiff_folder_path, group_name, tiff_files, None)
+                    continue
+                stale = self.exposure_index.stale_files(tiff_folder_path, tiff_files, self.exposure_threshold)
+                if stale:
+                    future = executor.submit(compute_exposure_entries, tiff_folder_path, stale,
+                                             self.exposure_index.compute_level(self.exposure_threshold))
+                    pending[future] = (tiff_folder_path, group_name, tiff_files, stale)
                 else:
-                    if any(item_text in group_name for group_name in self.overexposed_group_names):
-                        exposure_icon = style.standardIcon(QtWidgets.QStyle.SP_MessageBoxWarning)
-                        exposure_icon.paint(painter, option.rect.adjusted(option.rect.width() - 40, 0, 50, 0))
-                        logger.info(
-                            f"绘制曝光图标于: {item_text} (位置: {option.rect.adjusted(option.rect.width() - 40, 0, 50, 0)})")
+                    self.report_indexed_group(tiff_folder_path, group_name, tiff_files)
+                    self.progress.emit(self.done_count, total)
+
+            while pending and not self.cancel_event.is_set():
+                # 定时醒来检查取消标志
+                done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tiff_folder_path, group_name, tiff_files, stale = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.done_count += 1
+                        logger.error(f"过曝检测出错: {e}")
+                        continue
+                    if stale is None:
+                        self.done_count += 1
+                        self.report_group(*result)
+                    else:
+                        self.exposure_index.update(tiff_folder_path, stale, result)
+                        self.report_indexed_group(tiff_folder_path, group_name, tiff_files)
+                if done:
+                    self.progress.emit(self.done_count, total)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if use_index:
+                for tiff_folder_path in {task[0] for task in tasks}:
+                    self.exposure_index.save(tiff_folder_path)
+
+    def report_indexed_group(self, tiff_folder_path, group_name, tiff_files):
+        # 缺失或过期的图片已由进程池计算并合并进索引，这里只查内存，不在本线程中读取图片
+        counts = self.exposure_index.indexed_group_counts(tiff_folder_path, tiff_files, self.exposure_threshold,
+                                                          self.continuous_pixel_count)
+        self.done_count += 1
+        self.report_group(group_name, counts.get(group_name, 0))
+
+    def report_group(self, group_name, count):
+        if count >= self.max_exposure_count:
+            self.overexposed_count += 1
+            self.group_overexposed.emit(group_name, count)
+
+
+class BulkExportWorker(QtCore.QObject):
+    """在后台线程中导出图片：目标文件夹模式下用线程池并行处理，归档模式下流式写入一个归档文件"""
+    progress = QtCore.pyqtSignal(int, int)  # 已处理的文件数, 总文件数
+    finished = QtCore.pyqtSignal(object)  # 导出结果统计（见 bulk_export.export_files）
+
+    def __init__(self, plan, output_folder, mode):
+        super().__init__()
+        self.plan = plan
+        self.output_folder = output_folder
+        self.mode = mode
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """可从界面线程直接调用"""
+        self.cancel_event.set()
+
+    def run(self):
+        logger.info(f"开始导出 {len(self.plan)} 个文件到 {self.output_folder}（{self.mode}）")
+        self.progress.emit(0, len(self.plan))
+        try:
+            summary = export_files(self.plan, self.output_folder, self.mode, cancel_event=self.cancel_event,
+                                   progress_callback=self.progress.emit)
+        except Exception as e:
+            logger.error(f"导出出错: {e}")
+            summary = {'exported': 0, 'skipped': 0, 'copied': 0, 'failed': len(self.plan), 'cancelled': False}
+        logger.info(f"导出{'已取消' if summary['cancelled'] else '完成'}: 导出 {summary['exported']} 个，"
+                    f"跳过 {summary['skipped']} 个，改为复制 {summary['copied']} 个，失败 {summary['failed']} 个")
+        self.finished.emit(summary)
 
 
 class MainWindow(QtWidgets.QMainWindow):
@@ -118,6 +344,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.tree_view.setModel(self.model)
         self.tree_view.setRootIndex(self.model.index(root_folder))
         self.tree_view.setHeaderHidden(True)
+        # 所有行等高，滚动时不必逐行计算高度
+        self.tree_view.setUniformRowHeights(True)
 
         # 设置列宽以适应文件夹名称
         header = self.tree_view.header()
@@ -148,6 +376,12 @@ class MainWindow(QtWidgets.QMainWindow):
         view_menu = menubar.addMenu('视图')
         self.create_menu_action(view_menu, '切换显示模式', self.toggle_mode)
         self.create_menu_action(view_menu, '检测图像中的过曝情况', self.detect_exposure)
+        self.create_menu_action(view_menu, '扫描所有数据的过曝情况', self.scan_all_exposure)
+        self.lod_action = QtWidgets.QAction('细节层次显示（先显示简化模型）', self)
+        self.lod_action.setCheckable(True)
+        self.lod_action.toggled.connect(self.toggle_lod)
+        view_menu.addAction(self.lod_action)
+        self.create_menu_action(view_menu, '设置细节层次预算', self.set_lod_budget)
 
         # 创建工具栏
         self.toolbar = QtWidgets.QToolBar()
@@ -213,9 +447,95 @@ class MainWindow(QtWidgets.QMainWindow):
         # 当前选择的文件夹路径
         self.current_group = None
 
+        # 后台过曝扫描
+        self.exposure_scan_thread = None
+        self.exposure_scan_worker = None
+        self.exposure_scan_progress = None
+
+        # 后台批量导出
+        self.export_mode = 'copy'  # 上次选择的导出方式
+        self.export_thread = None
+        self.export_worker = None
+        self.export_progress = None
+        self.export_description = None  # 正在导出的内容，用于进度和状态栏提示
+        self.export_destination = None  # 导出目标文件夹或归档文件
+
+        # 数据集索引：启动时并行扫描一次输入和输出目录，之后由文件系统监视器按目录增量更新
+        self.dataset_index = DatasetIndex(input_folder, output_folder)
+        self.dataset_index.build()
+        self.dataset_watcher = QtCore.QFileSystemWatcher(self)
+        self.dataset_watcher.directoryChanged.connect(self.on_dataset_folder_changed)
+        self.changed_dataset_folders = set()  # 等待重新扫描的目录
+        # 处理过程中同一目录会连续变化多次，合并到一次刷新
+        self.dataset_refresh_timer = QtCore.QTimer(self)
+        self.dataset_refresh_timer.setSingleShot(True)
+        self.dataset_refresh_timer.setInterval(200)
+        self.dataset_refresh_timer.timeout.connect(self.refresh_dataset_index)
+        self.watch_dataset_folders()
+
+        # 过曝统计索引，调整曝光参数后重新检测时不再重新读取图片
+        self.exposure_index = ExposureIndex(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exposure_index'))
+
+        # 缩略图在后台线程中解码并缓存，界面线程只负责显示
+        self.thumbnail_loader = ThumbnailLoader(
+            disk_cache_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thumbnail_cache'), parent=self)
+        self.thumbnail_loader.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.pending_thumbnails = {}  # 当前组等待解码的图片路径 -> label 序号
+
+        # 点云和网格在后台线程中读取并缓存，切换显示模式或回到看过的组时不再重新读文件
+        self.geometry_loader = GeometryLoader(parent=self)
+        self.geometry_loader.geometry_ready.connect(self.on_geometry_ready)
+        self.geometry_loader.lod_ready.connect(self.on_lod_ready)
+        self.pending_geometries = {}  # 当前组等待读取的 PLY 路径 -> 显示它的窗口编号列表
+
+        # 细节层次模式：先显示不超过预算的简化模型，停留在该组时再换成完整模型
+        self.lod_enabled = False
+        self.lod_point_budget = DEFAULT_LOD_POINT_BUDGET  # 每个窗口的点数预算
+        self.lod_triangle_budget = DEFAULT_LOD_TRIANGLE_BUDGET  # 每个窗口的三角形数预算
+        self.pending_lods = {}  # 等待简化模型的 PLY 路径 -> 窗口编号列表
+        self.refining = {}  # 正在显示简化模型的 PLY 路径 -> [(窗口编号, 简化模型), ...]
+        self.awaiting_full = set()  # 已到换成完整模型的时间、但完整模型还在读取的 PLY 路径
+        self.ply_generation = 0  # 每次刷新显示加一，过期的换模型定时器据此忽略
+
         # 调整窗口大小
         self.setGeometry(100, 80, 1000, 800)
 
+    def closeEvent(self, event):
+        if self.exposure_scan_thread is not None:
+            # 正在检测的组完成后停止，尚未开始的组不再提交
+            self.exposure_scan_worker.cancel()
+            self.exposure_scan_thread.quit()
+            self.exposure_scan_thread.wait()
+        if self.export_thread is not None:
+            # 已开始的文件写完后停止，未完成的归档会被删除
+            self.export_worker.cancel()
+            self.export_thread.quit()
+            self.export_thread.wait()
+        self.thumbnail_loader.shutdown()
+        self.geometry_loader.shutdown()
+        super().closeEvent(event)
+
+    def watch_dataset_folders(self):
+        watched = set(self.dataset_watcher.directories())
+        folders = [folder for folder in self.dataset_index.watched_folders()
+                   if folder not in watched and os.path.isdir(folder)]
+        if folders:
+            self.dataset_watcher.addPaths(folders)
+
+    def on_dataset_folder_changed(self, path):
+        self.changed_dataset_folders.add(path)
+        self.dataset_refresh_timer.start()
+
+    def refresh_dataset_index(self):
+        changed_subfolders = {self.dataset_index.refresh_folder(path) for path in self.changed_dataset_folders}
+        self.changed_dataset_folders = set()
+        # 新建的 tiff 文件夹和输出子文件夹也要监视，已删除的目录监视器会自动移除
+        self.watch_dataset_folders()
+        if self.current_group:
+            subfolder = os.path.basename(self.group_location(self.current_group)[0])
+            if None in changed_subfolders or subfolder in changed_subfolders:
+                self.set_alert_images()
+
     def create_menu_action(self, menu, text, slot):
         action = QtWidgets.QAction(text, self)
         action.triggered.connect(slot)
@@ -250,9 +570,9 @@ class MainWindow(QtWidgets.QMainWindow):
                 tiff_folder_path = os.path.join(base_folder, "tiff")
                 logger.info(f"TIFF 文件夹路径: {tiff_folder_path}")
 
-                if os.path.exists(tiff_folder_path):
-                    # 列出 TIFF 文件并排序
-                    tiff_files = sorted([f for f in os.listdir(tiff_folder_path) if f.endswith('.tif')])
+                # 从数据集索引中取出排序后的 TIFF 文件
+                tiff_files = self.dataset_index.tiff_files.get(os.path.basename(base_folder))
+                if tiff_files is not None:
                     logger.info(f"找到的 TIFF 文件: {tiff_files}")
 
                     # 检查曝光情况
@@ -268,68 +588,79 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def check_exposure(self, tiff_files, tiff_folder_path, exposure_threshold, continuous_pixel_count,
                        max_exposure_count):
-        overexposed_images = []
         logger.info("开始曝光检查。")
         logger.info(f"曝光阈值: {exposure_threshold}")
         logger.info(f"连续像素数要求: {continuous_pixel_count}")
         logger.info(f"最大曝光组数: {max_exposure_count}")
 
-        # 统计每个组的总曝光数
-        group_exposure_count = {}
-
-        for tiff_file in tiff_files:
-            # 提取文件的索引部分（如 image_54_3.tif 中的 "3"）
-            index_str = os.path.splitext(tiff_file)[0].split('_')[-1]
-
-            # 仅处理索引在 3 到 6 之间的文件
-            if index_str.isdigit() and 3 <= int(index_str) <= 6:
-                image_path = os.path.join(tiff_folder_path, tiff_file)
-                logger.info(f"正在处理文件: {tiff_file}")
-
-                image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-
-                if image is None:
-                    logger.error(f"无法读取图像: {tiff_file}")
-                    continue
-
-                # 应用阈值以找到过曝像素
-                _, thresholded = cv2.threshold(image, exposure_threshold, 255, cv2.THRESH_BINARY)
-                logger.info(f"已计算阈值图像: {tiff_file}")
-
-                # 统计当前文件的过曝像素数
-                total_overexposure_count = 0
-                for row_idx, row in enumerate(thresholded):
-                    consecutive_count = 0
-                    for pixel in row:
-                        if pixel >= exposure_threshold:
-                            consecutive_count += 1
-                            if consecutive_count >= continuous_pixel_count:
-                                total_overexposure_count += 1
-                                break
-                        else:
-                            consecutive_count = 0
-                    if row_idx % 79 == 0:  # 每处理80行输出一次信息
-                        logger.info(f"已处理 {tiff_file} 的第 {row_idx} 行")
-
-                # 记录每个组的总曝光数
-                group_name = os.path.splitext(tiff_file)[0][:-2]  # 提取组名
-                if group_name not in group_exposure_count:
-                    group_exposure_count[group_name] = 0
-                group_exposure_count[group_name] += total_overexposure_count
-
-                logger.info(f"文件 {tiff_file} 检测到过曝，组数: {total_overexposure_count}")
-            else:
-                logger.info(f"跳过文件: {tiff_file}")
+        # 统计每个组的总曝光数：图片只在首次检测或修改后读取，之后从过曝索引中查出（见 exposure_index）
+        group_exposure_count = self.exposure_index.group_exposure_counts(tiff_folder_path, tiff_files,
+                                                                         exposure_threshold, continuous_pixel_count)
+        self.exposure_index.save(tiff_folder_path)
 
         # 确定过曝的组
-        for group_name, total_count in group_exposure_count.items():
-            if total_count >= max_exposure_count:
-                overexposed_images.append(group_name)
-                logger.info(f"组 {group_name} 总曝光数 {total_count} 超过最大值 {max_exposure_count}")
+        overexposed_images = overexposed_groups(group_exposure_count, max_exposure_count)
+        for group_name in overexposed_images:
+            logger.info(f"组 {group_name} 总曝光数 {group_exposure_count[group_name]} 超过最大值 {max_exposure_count}")
 
         logger.info(f"曝光检查完成, 返回过曝文件 {overexposed_images}")
         return overexposed_images
 
+    def scan_all_exposure(self):
+        """在后台扫描所有数据文件夹的过曝情况，界面保持响应，过曝组随结果逐个标记"""
+        if self.exposure_scan_thread is not None:
+            logger.warning("过曝扫描正在进行中")
+            return
+
+        dialog = ExposureDialog(self)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        values = dialog.get_values()
+
+        self.exposure_scan_thread = QtCore.QThread(self)
+        self.exposure_scan_worker = ExposureScanWorker(self.input_folder, values["exposure_threshold"],
+                                                       values["continuous_pixel_count"],
+                                                       values["max_exposure_count"], self.exposure_index)
+        self.exposure_scan_worker.moveToThread(self.exposure_scan_thread)
+        self.exposure_scan_thread.started.connect(self.exposure_scan_worker.run)
+        self.exposure_scan_worker.progress.connect(self.on_exposure_scan_progress)
+        self.exposure_scan_worker.group_overexposed.connect(self.on_group_overexposed)
+        self.exposure_scan_worker.finished.connect(self.on_exposure_scan_finished)
+        self.exposure_scan_worker.finished.connect(self.exposure_scan_thread.quit)
+        self.exposure_scan_thread.finished.connect(self.exposure_scan_worker.deleteLater)
+        self.exposure_scan_thread.finished.connect(self.exposure_scan_thread.deleteLater)
+
+        self.exposure_scan_progress = QtWidgets.QProgressDialog("正在扫描所有数据的过曝情况...", "取消", 0, 0, self)
+        self.exposure_scan_progress.setWindowTitle("过曝扫描")
+        self.exposure_scan_progress.setAutoClose(False)
+        self.exposure_scan_progress.setAutoReset(False)
+        # 工作线程忙于扫描，不能用排队连接；lambda 在界面线程中直接设置取消标志
+        worker = self.exposure_scan_worker
+        self.exposure_scan_progress.canceled.connect(lambda: worker.cancel())
+        self.exposure_scan_progress.show()
+
+        self.exposure_scan_thread.start()
+
+    def on_exposure_scan_progress(self, done_count, total):
+        if self.exposure_scan_progress is not None:
+            self.exposure_scan_progress.setMaximum(total)
+            self.exposure_scan_progress.setValue(done_count)
+            self.exposure_scan_progress.setLabelText(f"正在扫描所有数据的过曝情况... {done_count}/{total}")
+
+    def on_group_overexposed(self, group_name, count):
+        logger.info(f"组 {group_name} 总曝光数 {count} 超过最大值")
+        self.delegate.set_overexposed_group_names([group_name])
+        self.tree_view.viewport().update()
+
+    def on_exposure_scan_finished(self, overexposed_count, cancelled):
+        if self.exposure_scan_progress is not None:
+            self.exposure_scan_progress.close()
+            self.exposure_scan_progress = None
+        self.exposure_scan_thread = None
+        self.exposure_scan_worker = None
+        status = "已取消" if cancelled else "完成"
+        self.statusBar().showMessage(f"过曝扫描{status}，发现 {overexposed_count} 个过曝组", 10000)
+
     def mark_overexposed_nodes(self, overexposed_images):
         # 打印过曝图像列表
         logger.info("过曝图像列表:", overexposed_images)
@@ -372,21 +703,28 @@ class MainWindow(QtWidgets.QMainWindow):
         # 获取树状图点击的路径
         path = self.model.filePath(index)
 
-        if os.path.isdir(path):
+        # 文件系统模型已知道是否为文件夹，不必再访问磁盘
+        if self.model.isDir(index):
             self.current_group = path  # 记录当前选择的文件夹路径
             self.update_images_and_ply_files()
 
+    def group_location(self, group_path):
+        """树视图中的组路径对应的 (数据文件夹, 输出文件夹, 组名)"""
+        relative_path = os.path.relpath(group_path,
+                                        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_folder',
+                                                     'data_combitation'))
+        subfolder = relative_path.split(os.sep)[0]
+        return (os.path.join(self.input_folder, subfolder), os.path.join(self.output_folder, subfolder),
+                relative_path.split(os.sep)[-1])
+
     def update_images_and_ply_files(self):
         if self.current_group:
             # 根据当前选择的路径生成相应的输入和输出文件夹路径
-            relative_path = os.path.relpath(self.current_group,
-                                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_folder',
-                                                         'data_combitation'))
-            base_folder = os.path.join(self.input_folder, relative_path.split(os.sep)[0])
-            output_folder = os.path.join(self.output_folder, relative_path.split(os.sep)[0])
+            base_folder, output_folder, group_name = self.group_location(self.current_group)
 
-            # 更新图片
-            self.load_images(base_folder, relative_path.split(os.sep)[-1])
+            # 更新图片，并在后台预取相邻组的缩略图
+            self.load_images(base_folder, group_name)
+            self.prefetch_adjacent_groups()
 
             # 更新PLY文件
             self.update_ply_files(output_folder)
@@ -398,59 +736,75 @@ class MainWindow(QtWidgets.QMainWindow):
         missing_ply_group_names = set()
 
         if self.current_group:
-            relative_path = os.path.relpath(self.current_group,
-                                            os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_folder',
-                                                         'data_combitation'))
-            base_folder = os.path.join(self.input_folder, relative_path.split(os.sep)[0])
-            tiff_folder_path = os.path.join(base_folder, "tiff")
-
-            if os.path.exists(tiff_folder_path):
-                # 提取所有组名
-                group_names = {os.path.splitext(f)[0][:-2] for f in sorted(os.listdir(tiff_folder_path)) if
-                               f.endswith('.tif')}
-
-                for group_name in group_names:
-                    output_folder = os.path.join(self.output_folder, relative_path.split(os.sep)[0])
-
-                    # 对每个组，检查是否缺少对应的 .ply 文件
-                    expected_ply_file = f"{group_name}.ply"
-                    if not os.path.exists(output_folder) or not os.path.exists(
-                            os.path.join(output_folder, expected_ply_file)):
-                        missing_ply_group_names.add(group_name)
+            base_folder = self.group_location(self.current_group)[0]
+
+            # 对每个组，检查是否缺少对应的 .ply 文件（查询数据集索引，不访问磁盘）
+            missing_ply_group_names = self.dataset_index.missing_ply_groups(os.path.basename(base_folder))
 
         # 设置缺少 PLY 文件的组名
         self.delegate.set_missing_ply_group_names(missing_ply_group_names)
         self.tree_view.viewport().update()
 
+    def group_image_paths(self, base_folder, group_name):
+        """按显示顺序排列的组内图片路径（不足 8 张的位置为 None），TIFF 文件夹不存在时返回 None"""
+        subfolder = os.path.basename(base_folder)
+        if subfolder not in self.dataset_index.tiff_files:
+            return None
+        tiff_folder_path = self.dataset_index.tiff_folder(subfolder)
+        tiff_files = self.dataset_index.group_tiff_files(subfolder, group_name)
+
+        # 按照指定顺序显示图片
+        display_order = [7, 3, 0, 4, 1, 5, 2, 6]  # 你想要的图片显示顺序
+        return [os.path.join(tiff_folder_path, tiff_files[index]) if index < len(tiff_files) else None
+                for index in display_order]
+
     def load_images(self, base_folder, group_name):
-        tiff_folder_path = os.path.join(base_folder, "tiff")
-        if os.path.exists(tiff_folder_path):
-            tiff_files = [f for f in sorted(os.listdir(tiff_folder_path)) if
-                          f.startswith(group_name) and f.endswith('.tif')]
-
-            # 按照指定顺序显示图片
-            display_order = [7, 3, 0, 4, 1, 5, 2, 6]  # 你想要的图片显示顺序
-
-            for i, index in enumerate(display_order):
-                if index < len(tiff_files):
-                    image_path = os.path.join(tiff_folder_path, tiff_files[index])
-                    pixmap = QtGui.QPixmap(image_path)
-                    if pixmap.isNull():
-                        logger.error(f"Failed to load image: {image_path}")
-                    else:
-                        self.image_labels[i].setPixmap(
-                            pixmap.scaled(self.image_labels[i].size(), QtCore.Qt.KeepAspectRatio,
-                                          QtCore.Qt.SmoothTransformation))
-                else:
-                    self.image_labels[i].clear()  # 清除多余的label
-        else:
-            logger.warning(f"TIFF文件夹不存在: {tiff_folder_path}")
+        # 切换组后，上一组尚未开始的解码任务不再需要，迟到的结果也不再显示
+        self.thumbnail_loader.cancel_pending()
+        self.pending_thumbnails = {}
 
-    def update_ply_files(self, output_folder):
-        # 清除现有几何体
-        self.viewer1.clear_geometries()
-        self.viewer2.clear_geometries()
+        image_paths = self.group_image_paths(base_folder, group_name)
+        if image_paths is None:
+            logger.warning(f"TIFF文件夹不存在: {os.path.join(base_folder, 'tiff')}")
+            return
 
+        for i, image_path in enumerate(image_paths):
+            if image_path is None:
+                self.image_labels[i].clear()  # 清除多余的label
+                continue
+            image = self.thumbnail_loader.request(image_path, self.image_labels[i].size(),
+                                                  file_stat=self.dataset_index.file_stat(image_path))
+            if image is not None:
+                self.image_labels[i].setPixmap(QtGui.QPixmap.fromImage(image))
+            else:
+                # 解码完成后在 on_thumbnail_ready 中显示
+                self.image_labels[i].clear()
+                self.pending_thumbnails[image_path] = i
+
+    def on_thumbnail_ready(self, image_path, image):
+        i = self.pending_thumbnails.pop(image_path, None)
+        # 预取的结果或已切换到其他组时只进入缓存
+        if i is not None and not image.isNull():
+            self.image_labels[i].setPixmap(QtGui.QPixmap.fromImage(image))
+
+    def prefetch_adjacent_groups(self):
+        """预取树视图中上下相邻组的缩略图，点击相邻组时直接命中缓存"""
+        index = self.model.index(self.current_group)
+        for row in (index.row() + 1, index.row() - 1):
+            sibling = index.sibling(row, 0)
+            if not sibling.isValid():
+                continue
+            if not self.model.isDir(sibling):
+                continue
+            group_path = self.model.filePath(sibling)
+            base_folder, _, group_name = self.group_location(group_path)
+            for i, image_path in enumerate(self.group_image_paths(base_folder, group_name) or []):
+                if image_path is not None:
+                    self.thumbnail_loader.request(image_path, self.image_labels[i].size(), PRIORITY_PREFETCH,
+                                                  self.dataset_index.file_stat(image_path))
+
+    def match_ply_files(self, ply_names, mode):
+        """从输出文件夹的文件列表中选出指定显示模式下两个窗口各自显示的 PLY 文件"""
         # 根据当前模式和颜色模式选择PLY文件
         file_types = {
             "point_cloud_colored": r"^{}\.ply$".format(os.path.basename(self.current_group)),
@@ -459,7 +813,7 @@ class MainWindow(QtWidgets.QMainWindow):
             "mesh_colored": r"^{}_original_filtered_mesh\.ply$".format(os.path.basename(self.current_group))
         }
 
-        if self.current_mode == "point_cloud":
+        if mode == "point_cloud":
             if self.current_color_mode == "original":
                 file_pattern1 = file_types["point_cloud_original"]
                 file_pattern2 = file_types["point_cloud_colored"]
@@ -474,39 +828,138 @@ class MainWindow(QtWidgets.QMainWindow):
                 file_pattern1 = file_types["mesh_colored"]
                 file_pattern2 = file_types["mesh_original"]
 
-        ply_files1 = [f for f in sorted(os.listdir(output_folder)) if re.match(file_pattern1, f)]
-        ply_files2 = [f for f in sorted(os.listdir(output_folder)) if re.match(file_pattern2, f)]
+        ply_files1 = [f for f in ply_names if re.match(file_pattern1, f)]
+        ply_files2 = [f for f in ply_names if re.match(file_pattern2, f)]
+        return ply_files1, ply_files2
 
-        for ply_file in ply_files1:
-            ply_file_path = os.path.join(output_folder, ply_file)
-            if "mesh" in ply_file:
-                mesh = o3d.io.read_triangle_mesh(ply_file_path)
-                if not mesh.is_empty():
-                    self.viewer1.add_geometry(mesh)
-                else:
-                    logger.error(f"Failed to load mesh in viewer 1: {ply_file_path}")
-            else:
-                pcd = o3d.io.read_point_cloud(ply_file_path)
-                if not pcd.is_empty():
-                    self.viewer1.add_geometry(pcd)
-                else:
-                    logger.error(f"Failed to load point cloud in viewer 1: {ply_file_path}")
-
-        for ply_file in ply_files2:
-            ply_file_path = os.path.join(output_folder, ply_file)
-            if "mesh" in ply_file:
-                mesh = o3d.io.read_triangle_mesh(ply_file_path)
-                if not mesh.is_empty():
-                    self.viewer2.add_geometry(mesh)
+    def update_ply_files(self, output_folder):
+        # 清除现有几何体
+        self.viewer1.clear_geometries()
+        self.viewer2.clear_geometries()
+
+        # 上一组尚未开始的读取任务不再需要，迟到的结果也不再显示
+        self.geometry_loader.cancel_pending()
+        self.pending_geometries = {}
+        self.pending_lods = {}
+        self.refining = {}
+        self.awaiting_full = set()
+        self.ply_generation += 1
+
+        ply_names = self.dataset_index.output_files.get(os.path.basename(output_folder))
+        if ply_names is None:
+            logger.warning(f"输出文件夹不存在: {output_folder}")
+            self.refresh_viewers()
+            return
+
+        # 已缓存的几何体直接显示，其余在后台读取完成后由 on_geometry_ready 显示
+        ply_files1, ply_files2 = self.match_ply_files(ply_names, self.current_mode)
+        for viewer_number, ply_files in ((1, ply_files1), (2, ply_files2)):
+            for ply_file in ply_files:
+                ply_file_path = os.path.join(output_folder, ply_file)
+                # 缓存键用数据集索引中的大小和修改时间，不访问磁盘
+                file_stat = self.dataset_index.file_stat(ply_file_path)
+                if self.lod_enabled:
+                    # 窗口的预算由其中的文件平分
+                    budget = self.lod_triangle_budget if is_mesh_file(ply_file_path) else self.lod_point_budget
+                    lod = self.geometry_loader.request_lod(ply_file_path, max(1, budget // len(ply_files)),
+                                                           file_stat)
+                    if lod is None:
+                        self.pending_lods.setdefault(ply_file_path, []).append(viewer_number)
+                    else:
+                        self.show_lod(viewer_number, ply_file_path, lod)
+                    continue
+                geometry = self.geometry_loader.request(ply_file_path, file_stat=file_stat)
+                if geometry is None:
+                    self.pending_geometries.setdefault(ply_file_path, []).append(viewer_number)
                 else:
-                    logger.error(f"Failed to load mesh in viewer 2: {ply_file_path}")
+                    self.show_geometry(viewer_number, ply_file_path, geometry)
+        self.refresh_viewers()
+
+        # 预取另一种显示模式的文件，切换模式时直接命中缓存
+        other_mode = "mesh" if self.current_mode == "point_cloud" else "point_cloud"
+        for ply_files in self.match_ply_files(ply_names, other_mode):
+            for ply_file in ply_files:
+                ply_file_path = os.path.join(output_folder, ply_file)
+                self.geometry_loader.request(ply_file_path, GEOMETRY_PRIORITY_PREFETCH,
+                                             self.dataset_index.file_stat(ply_file_path))
+
+    def show_geometry(self, viewer_number, ply_file_path, geometry):
+        viewer = self.viewer1 if viewer_number == 1 else self.viewer2
+        if geometry.is_empty():
+            if is_mesh_file(ply_file_path):
+                logger.error(f"Failed to load mesh in viewer {viewer_number}: {ply_file_path}")
             else:
-                pcd = o3d.io.read_point_cloud(ply_file_path)
-                if not pcd.is_empty():
-                    self.viewer2.add_geometry(pcd)
-                else:
-                    logger.error(f"Failed to load point cloud in viewer 2: {ply_file_path}")
+                logger.error(f"Failed to load point cloud in viewer {viewer_number}: {ply_file_path}")
+            return
+        viewer.add_geometry(geometry)
+
+    def on_geometry_ready(self, ply_file_path, geometry):
+        if ply_file_path in self.awaiting_full:
+            self.awaiting_full.discard(ply_file_path)
+            self.replace_lod(ply_file_path, geometry)
+        viewer_numbers = self.pending_geometries.pop(ply_file_path, None)
+        # 预取的结果或已切换到其他组时只进入缓存
+        if viewer_numbers is None:
+            return
+        for viewer_number in viewer_numbers:
+            self.show_geometry(viewer_number, ply_file_path, geometry)
+        self.refresh_viewers()
 
+    def show_lod(self, viewer_number, ply_file_path, lod):
+        self.show_geometry(viewer_number, ply_file_path, lod)
+        if lod.is_empty():
+            return
+        # 在该组停留 LOD_REFINE_DELAY_MS 后再换成完整模型，快速浏览时不上传完整模型
+        self.refining.setdefault(ply_file_path, []).append((viewer_number, lod))
+        generation = self.ply_generation
+        QtCore.QTimer.singleShot(LOD_REFINE_DELAY_MS, lambda: self.refine_geometry(ply_file_path, generation))
+
+    def on_lod_ready(self, ply_file_path, lod):
+        viewer_numbers = self.pending_lods.pop(ply_file_path, None)
+        if viewer_numbers is None:
+            return
+        for viewer_number in viewer_numbers:
+            self.show_lod(viewer_number, ply_file_path, lod)
+        self.refresh_viewers()
+
+    def refine_geometry(self, ply_file_path, generation):
+        if generation != self.ply_generation or ply_file_path not in self.refining:
+            return
+        geometry = self.geometry_loader.request(ply_file_path, file_stat=self.dataset_index.file_stat(ply_file_path))
+        if geometry is None:
+            # 完整模型已被缓存淘汰，读取完成后在 on_geometry_ready 中替换
+            self.awaiting_full.add(ply_file_path)
+        else:
+            self.replace_lod(ply_file_path, geometry)
+
+    def replace_lod(self, ply_file_path, geometry):
+        """把窗口中的简化模型换成完整模型，保持当前视角"""
+        for viewer_number, lod in self.refining.pop(ply_file_path, []):
+            if lod is geometry or geometry.is_empty():
+                continue
+            viewer = self.viewer1 if viewer_number == 1 else self.viewer2
+            viewer.remove_geometry(lod, reset_bounding_box=False)
+            viewer.add_geometry(geometry, reset_bounding_box=False)
+        self.refresh_viewers()
+
+    def toggle_lod(self, checked):
+        self.lod_enabled = checked
+        logger.info(f"细节层次显示: {'开启' if checked else '关闭'}")
+        if self.current_group:
+            self.update_ply_files(self.group_location(self.current_group)[1])
+
+    def set_lod_budget(self):
+        dialog = LodBudgetDialog(self.lod_point_budget, self.lod_triangle_budget, self)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        values = dialog.get_values()
+        self.lod_point_budget = values["point_budget"]
+        self.lod_triangle_budget = values["triangle_budget"]
+        logger.info(f"细节层次预算: 每个窗口 {self.lod_point_budget} 点, {self.lod_triangle_budget} 个三角形")
+        if self.lod_enabled and self.current_group:
+            self.update_ply_files(self.group_location(self.current_group)[1])
+
+    def refresh_viewers(self):
         self.viewer1.poll_events()
         self.viewer1.update_renderer()
         self.viewer2.poll_events()
@@ -530,8 +983,8 @@ class MainWindow(QtWidgets.QMainWindow):
         self.update_mode_icon()  # 更新图标和提示信息
 
         if self.current_group:
-            self.update_ply_files(os.path.join(self.output_folder, os.path.relpath(self.current_group, os.path.join(
-                os.path.dirname(os.path.abspath(__file__)), 'debug_folder', 'data_combitation')).split(os.sep)[0]))
+            # 切换前的模式已读过的文件和预取的文件都在缓存中，不会重新读取
+            self.update_ply_files(self.group_location(self.current_group)[1])
 
     def output_exposure_photos(self):
         # 获取过曝组名称
@@ -541,39 +994,10 @@ class MainWindow(QtWidgets.QMainWindow):
             logger.warning("没有过曝组")
             return
 
-        # 获取当前文件的根目录
+        # 输出到当前文件的根目录下，保持与输入路径一致
         root_directory = os.path.dirname(os.path.abspath(__file__))
-
-        # 创建输出目录
-        output_folder = os.path.join(root_directory, 'output_exposure_photos')
-        os.makedirs(output_folder, exist_ok=True)
-
-        # 遍历每个过曝组
-        for group_name in overexposed_groups:
-            # 遍历 input_folder 下的所有文件夹
-            for folder in os.listdir(self.input_folder):
-                tiff_folder_path = os.path.join(self.input_folder, folder, "tiff")
-                if os.path.exists(tiff_folder_path):
-                    # 获取该 TIFF 文件夹下的所有 TIFF 文件
-                    tiff_files = [f for f in sorted(os.listdir(tiff_folder_path)) if f.endswith('.tif')]
-
-                    # 找到属于当前过曝组的文件
-                    for tiff_file in tiff_files:
-                        if tiff_file.startswith(group_name):
-                            # 生成输出文件夹路径，保持与输入路径一致
-                            group_output_folder = os.path.join(output_folder, folder, "tiff")
-                            os.makedirs(group_output_folder, exist_ok=True)
-
-                            # 复制文件到输出文件夹
-                            src_file = os.path.join(tiff_folder_path, tiff_file)
-                            dest_file = os.path.join(group_output_folder, tiff_file)
-                            shutil.copy2(src_file, dest_file)
-
-                            logger.info(f"复制过曝文件: {tiff_file} 到 {group_output_folder}")
-                else:
-                    logger.warning(f"TIFF 文件夹不存在: {tiff_folder_path}")
-
-        logger.info("所有过曝组的照片已输出完毕")
+        self.start_bulk_export("过曝组的照片", overexposed_groups,
+                               os.path.join(root_directory, 'output_exposure_photos'))
 
     def output_missing_ply_photos(self):
         # 获取缺少 PLY 文件的组名称
@@ -583,39 +1007,69 @@ class MainWindow(QtWidgets.QMainWindow):
             logger.warning("没有缺少 PLY 文件的组")
             return
 
-        # 获取当前文件的根目录
+        # 输出到当前文件的根目录下，保持与输入路径一致
         root_directory = os.path.dirname(os.path.abspath(__file__))
+        self.start_bulk_export("缺少 PLY 文件的图片组", missing_ply_groups,
+                               os.path.join(root_directory, 'output_missing_ply_photos'))
 
-        # 创建输出目录
-        output_folder = os.path.join(root_directory, 'output_missing_ply_photos')
-        os.makedirs(output_folder, exist_ok=True)
-
-        # 遍历每个缺少 PLY 文件的组
-        for group_name in missing_ply_groups:
-            # 遍历 input_folder 下的所有文件夹
-            for folder in os.listdir(self.input_folder):
-                tiff_folder_path = os.path.join(self.input_folder, folder, "tiff")
-                if os.path.exists(tiff_folder_path):
-                    # 获取该 TIFF 文件夹下的所有 TIFF 文件
-                    tiff_files = [f for f in sorted(os.listdir(tiff_folder_path)) if f.endswith('.tif')]
-
-                    # 找到属于当前缺少 PLY 文件组的文件
-                    for tiff_file in tiff_files:
-                        if tiff_file.startswith(group_name):
-                            # 生成输出文件夹路径，保持与输入路径一致
-                            group_output_folder = os.path.join(output_folder, folder, "tiff")
-                            os.makedirs(group_output_folder, exist_ok=True)
-
-                            # 复制文件到输出文件夹
-                            src_file = os.path.join(tiff_folder_path, tiff_file)
-                            dest_file = os.path.join(group_output_folder, tiff_file)
-                            shutil.copy2(src_file, dest_file)
-
-                            logger.info(f"复制缺少 PLY 文件的图片: {tiff_file} 到 {group_output_folder}")
-                else:
-                    logger.warning(f"TIFF 文件夹不存在: {tiff_folder_path}")
+    def start_bulk_export(self, description, group_names, output_folder):
+        """选择导出方式后在后台导出这些组的图片，界面保持响应，可随时取消"""
+        if self.export_thread is not None:
+            logger.warning("导出正在进行中")
+            return
 
-        logger.info("所有缺少 PLY 文件的图片组已输出完毕")
+        dialog = ExportDialog(self.export_mode, self)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        self.export_mode = dialog.get_values()["mode"]
+
+        # 从数据集索引中直接取出每个组所在的数据文件夹和组内文件，目标路径为 子文件夹/tiff/文件名
+        plan = [(src_file, os.path.join(folder, "tiff", os.path.basename(src_file)))
+                for folder, tiff_paths in self.dataset_index.group_tiff_paths(group_names)
+                for src_file in tiff_paths]
+        self.export_description = description
+        self.export_destination = (archive_path(output_folder, self.export_mode)
+                                   if self.export_mode in ARCHIVE_MODES else output_folder)
+
+        self.export_thread = QtCore.QThread(self)
+        self.export_worker = BulkExportWorker(plan, output_folder, self.export_mode)
+        self.export_worker.moveToThread(self.export_thread)
+        self.export_thread.started.connect(self.export_worker.run)
+        self.export_worker.progress.connect(self.on_export_progress)
+        self.export_worker.finished.connect(self.on_export_finished)
+        self.export_worker.finished.connect(self.export_thread.quit)
+        self.export_thread.finished.connect(self.export_worker.deleteLater)
+        self.export_thread.finished.connect(self.export_thread.deleteLater)
+
+        self.export_progress = QtWidgets.QProgressDialog(f"正在导出{description}...", "取消", 0, len(plan), self)
+        self.export_progress.setWindowTitle("导出")
+        self.export_progress.setAutoClose(False)
+        self.export_progress.setAutoReset(False)
+        # 工作线程忙于导出，不能用排队连接；lambda 在界面线程中直接设置取消标志
+        worker = self.export_worker
+        self.export_progress.canceled.connect(lambda: worker.cancel())
+        self.export_progress.show()
+
+        self.export_thread.start()
+
+    def on_export_progress(self, done_count, total):
+        if self.export_progress is not None:
+            self.export_progress.setMaximum(total)
+            self.export_progress.setValue(done_count)
+            self.export_progress.setLabelText(f"正在导出{self.export_description}... {done_count}/{total}")
+
+    def on_export_finished(self, summary):
+        if self.export_progress is not None:
+            self.export_progress.close()
+            self.export_progress = None
+        self.export_thread = None
+        self.export_worker = None
+        status = "已取消" if summary['cancelled'] else "完成"
+        message = (f"导出{self.export_description}{status}: 导出 {summary['exported'] + summary['copied']} 个，"
+                   f"跳过已存在的 {summary['skipped']} 个")
+        if summary['failed']:
+            message += f"，失败 {summary['failed']} 个"
+        self.statusBar().showMessage(f"{message}（{self.export_destination}）", 10000)
 
     def get_missing_ply_groups(self):
         # 从代理中获取过曝组名称